@@ -0,0 +1,232 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, Request
+
+from metrics import ADMISSION_REJECTIONS
+
+T = TypeVar("T")
+
+
+class MemoryBucketStore:
+    """Token buckets for one process"""
+
+    def __init__(self, max_clients: int = 100_000):
+        self.max_clients = max_clients
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """
+        Take `cost` tokens from key's bucket.
+
+        Returns:
+            0 if allowed, otherwise seconds until enough tokens are available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._prune(now, rate, burst)
+        return 0.0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now: float, rate: float, burst: float):
+        # Full buckets carry no state; forget them
+        full_after = burst / rate
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+
+class SqliteBucketStore:
+    """
+    Token buckets in a local SQLite file, shared by several worker processes
+    on one host (uvicorn --workers N).
+
+    Each take() is one short IMMEDIATE transaction, so updates from
+    different workers serialize on the database lock.
+    """
+
+    def __init__(self, path: str, prune_every: int = 1000):
+        self.path = path
+        self.prune_every = prune_every
+        self._takes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        # Wall clock, since monotonic clocks are not shared between processes
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._takes += 1
+            if self._takes % self.prune_every == 0:
+                # Buckets that have refilled completely carry no state
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - burst / rate,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if allowed else (cost - tokens) / rate
+
+
+class AdmissionController:
+    """
+    Admission control for the generation endpoints.
+
+    - Per-client token bucket: RATE_LIMIT_PER_MINUTE tokens refill per
+      minute up to RATE_LIMIT_BURST; an image job costs 1 token and a 3D job
+      RATE_LIMIT_3D_COST tokens. Clients are identified by X-API-Key, else
+      by IP (X-Forwarded-For is only trusted with TRUST_PROXY=true).
+    - Global queue cap: at most MAX_QUEUE_DEPTH pending/processing jobs.
+    - Wait estimate: recent job durations per kind times the work queued
+      ahead, divided by GENERATION_CONCURRENCY.
+
+    Rejections raise 429 with a Retry-After header. Buckets live in memory
+    unless RATE_LIMIT_DB points at a SQLite file shared by all workers.
+
+    Raises:
+        ValueError: If a job costs more tokens than the bucket holds, since
+            that endpoint could then never be admitted
+    """
+
+    def __init__(self, store=None):
+        per_minute = float(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))
+        self.enabled = per_minute > 0
+        self.rate = per_minute / 60.0
+        self.burst = float(os.getenv("RATE_LIMIT_BURST", "10"))
+        self.costs = {"image": 1.0, "world": float(os.getenv("RATE_LIMIT_3D_COST", "5"))}
+        if self.enabled:
+            for kind, cost in self.costs.items():
+                if cost > self.burst:
+                    raise ValueError(
+                        f"Rate limit cost of a {kind} job ({cost:g}) exceeds RATE_LIMIT_BURST "
+                        f"({self.burst:g}); raise RATE_LIMIT_BURST or lower RATE_LIMIT_3D_COST"
+                    )
+        self.max_queue_depth = int(os.getenv("MAX_QUEUE_DEPTH", "50"))
+        self.concurrency = max(1, int(os.getenv("GENERATION_CONCURRENCY", "1")))
+        self.trust_proxy = os.getenv("TRUST_PROXY", "").lower() in ("1", "true", "yes")
+
+        if store is None:
+            db_path = os.getenv("RATE_LIMIT_DB")
+            store = SqliteBucketStore(db_path) if db_path else MemoryBucketStore()
+        self.store = store
+
+        # Fallbacks until real durations have been observed
+        self._durations: Dict[str, Deque[float]] = {"image": deque(maxlen=50), "world": deque(maxlen=50)}
+        self._defaults = {"image": 60.0, "world": 600.0}
+        self._lock = threading.Lock()
+        # Serializes queue check + job creation across concurrent requests
+        self._admit_lock = threading.Lock()
+
+    def client_key(self, request: Request, api_key: Optional[str] = None) -> str:
+        if api_key:
+            # Don't keep raw keys in memory or in the shared store
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        if self.trust_proxy:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                return "ip:" + forwarded.split(",")[0].strip()
+        return "ip:" + (request.client.host if request.client else "unknown")
+
+    # ------------------------------------------------------------------
+    # Wait estimates
+    # ------------------------------------------------------------------
+
+    def record_duration(self, kind: str, seconds: float):
+        with self._lock:
+            self._durations[kind].append(seconds)
+
+    def expected_duration(self, kind: str) -> float:
+        with self._lock:
+            recent = self._durations[kind]
+            if not recent:
+                return self._defaults[kind]
+            return sum(recent) / len(recent)
+
+    def estimate_wait(self, queued_kinds: Iterable[str]) -> float:
+        """Seconds until a job submitted now would start"""
+        work = sum(self.expected_duration(kind) for kind in queued_kinds)
+        return work / self.concurrency
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def admit(self, endpoint: str, kind: str, client: str,
+              queued_kinds: Callable[[], Iterable[str]], create: Callable[[float], T]) -> T:
+        """
+        Admit a job and create it, or raise 429.
+
+        The queue is read and the job created under one lock, so concurrent
+        requests can't all pass the depth check on the same queue length.
+
+        Args:
+            endpoint: Endpoint name, for metrics
+            kind: "image" or "world"
+            client: Key from client_key()
+            queued_kinds: Callable returning the kinds of jobs currently
+                pending or processing
+            create: Callable(estimated wait in seconds) -> job; must add the
+                job to what queued_kinds() returns
+
+        Returns:
+            Whatever create() returned
+        """
+        with self._admit_lock:
+            queued = list(queued_kinds())
+
+            if self.max_queue_depth and len(queued) >= self.max_queue_depth:
+                # A slot frees up when the next running job finishes
+                retry_after = self.estimate_wait(queued[:self.concurrency])
+                self._reject(endpoint, "queue_full", retry_after,
+                             f"Generation queue is full ({len(queued)} jobs)")
+
+            if self.enabled:
+                retry_after = self.store.take(client, self.rate, self.burst, self.costs[kind])
+                if retry_after > 0:
+                    self._reject(endpoint, "rate_limited", retry_after, "Rate limit exceeded")
+
+            return create(self.estimate_wait(queued))
+
+    def _reject(self, endpoint: str, reason: str, retry_after: float, detail: str):
+        ADMISSION_REJECTIONS.inc(endpoint=endpoint, reason=reason)
+        raise HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
@@ -0,0 +1,41 @@
+"""
+Naming and sizing helpers shared by everything that handles stored
+artifacts (retention, reconcile, the worlds index, static serving, S3).
+"""
+
+import os
+from typing import Optional
+
+# World directories (WORLDS_DIR) and S3 prefixes (worlds/) are world_<image id>
+WORLD_PREFIX = "world_"
+
+# Panoramas are never rewritten under the same name (ids are unique)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Worlds are: regenerating one rewrites world_<image id>/scene.glb in
+# place, so caches must revalidate (cheap with the content-hash ETag)
+WORLD_CACHE_CONTROL = "public, no-cache"
+
+
+def world_owner(world_id: str) -> Optional[str]:
+    """Image id a world was generated from, or None if not a world id"""
+    if not world_id.startswith(WORLD_PREFIX):
+        return None
+    return world_id[len(WORLD_PREFIX):]
+
+
+def file_size(path: str) -> int:
+    """Size of a file, 0 if it is gone"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def tree_size(path: str) -> int:
+    """Total size of the files under a directory"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            total += file_size(os.path.join(dirpath, name))
+    return total
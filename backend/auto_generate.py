@@ -10,7 +10,11 @@ from datetime import datetime
 from image_generator import FluxPanoramaGenerator
 from prompt_generator import PromptGenerator
 from storage import ImageStorage
-import json
+from metadata_store import MetadataStore, new_image_id
+from metrics import JOBS_TOTAL, StageTimer, write_metrics
+from quality import QualityGate
+from typing import Optional
+import io
 import os
 
 
@@ -19,12 +23,21 @@ async def generate_single(
     prompt_gen: PromptGenerator,
     storage: ImageStorage,
     scenario: str,
-    output_dir: str = "/app/generated_images"
+    output_dir: str = "/app/generated_images",
+    prompt: Optional[str] = None,
+    quality_gate: Optional[QualityGate] = None,
+    metadata_store: Optional[MetadataStore] = None
 ):
-    """Generate a single image"""
+    """Generate a single image, and append it to metadata_store if given"""
+
+    quality_gate = quality_gate or QualityGate()
+
+    timer = StageTimer("batch")
 
     # Generate prompt
-    prompt = prompt_gen.generate(scenario)
+    with timer.span("prompt"):
+        if prompt is None:
+            prompt = prompt_gen.generate(scenario)
     print(f"\n{'='*60}")
     print(f"Scenario: {scenario}")
     print(f"Prompt: {prompt}")
@@ -32,21 +45,27 @@ async def generate_single(
 
     # Generate image
     print("Generating image...")
-    start_time = datetime.now()
 
-    image = generator.generate(prompt)
+    # Re-rolled with a new seed if the panorama fails the quality check
+    image, quality = quality_gate.generate(lambda seed: generator.generate(prompt, seed=seed), timer=timer)
 
-    elapsed = (datetime.now() - start_time).total_seconds()
-    print(f"Generated in {elapsed:.2f} seconds")
+    elapsed = timer.timings["diffusion"]
+    print(f"Generated in {elapsed:.2f} seconds (quality: {quality})")
 
     # Save image
-    image_id = f"{int(datetime.utcnow().timestamp())}"
-    local_path = f"{output_dir}/{image_id}.png"
-    image.save(local_path)
+    image_id = new_image_id()
+
+    with timer.span("encode"):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+
+    with timer.span("save"):
+        local_path = storage.save_image(image_id, buffer.getvalue())
     print(f"Saved locally: {local_path}")
 
     # Upload to storage
-    image_url = storage.upload(local_path, image_id)
+    with timer.span("upload"):
+        image_url = storage.upload(local_path, image_id)
     print(f"Available at: {image_url}")
 
     # Create metadata
@@ -56,16 +75,27 @@ async def generate_single(
         "image_url": image_url,
         "created_at": datetime.utcnow().isoformat(),
         "scenario": scenario,
-        "generation_time": elapsed
+        "generation_time": elapsed,
+        "timings": timer.timings,
+        "quality": quality
     }
 
+    if metadata_store is not None:
+        # Same timer as the other stages; the journal line is written inside
+        # the span, so only the returned timings include this stage
+        with timer.span("metadata_commit"):
+            metadata_store.add(metadata)
+        print("Stage timings: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timer.timings.items()))
+
     return metadata
 
 
 async def generate_batch(
     scenarios: list,
     count_per_scenario: int = 1,
-    output_dir: str = "/app/generated_images"
+    output_dir: str = "/app/generated_images",
+    seed: Optional[int] = None,
+    metrics_file: Optional[str] = None
 ):
     """Generate multiple images across scenarios"""
 
@@ -73,18 +103,14 @@ async def generate_batch(
     print("Initializing generator...")
     generator = FluxPanoramaGenerator()
     prompt_gen = PromptGenerator()
-    storage = ImageStorage()
+    storage = ImageStorage(images_dir=output_dir)
+    quality_gate = QualityGate()
 
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
 
-    # Load existing metadata
-    metadata_file = f"{output_dir}/metadata.json"
-    if os.path.exists(metadata_file):
-        with open(metadata_file, "r") as f:
-            all_metadata = json.load(f)
-    else:
-        all_metadata = []
+    # Load existing metadata (shared journal with the API server)
+    metadata_store = MetadataStore(output_dir)
 
     # Generate images
     total = len(scenarios) * count_per_scenario
@@ -98,25 +124,30 @@ async def generate_batch(
     print(f"{'='*60}\n")
 
     for scenario in scenarios:
-        for i in range(count_per_scenario):
+        # Unique prompts per scenario, reproducible when a seed is given
+        prompts = prompt_gen.generate_batch(scenario, count_per_scenario, seed)
+
+        for prompt in prompts:
             current += 1
             print(f"\nProgress: {current}/{total}")
 
-            metadata = await generate_single(
-                generator, prompt_gen, storage, scenario, output_dir
-            )
-
-            # Add to metadata list
-            all_metadata.insert(0, metadata)
+            try:
+                # Appended to the metadata journal after each generation
+                await generate_single(
+                    generator, prompt_gen, storage, scenario, output_dir, prompt, quality_gate, metadata_store
+                )
+            except Exception:
+                JOBS_TOTAL.inc(kind="batch", outcome="failed")
+                raise
+            JOBS_TOTAL.inc(kind="batch", outcome="completed")
 
-            # Save metadata after each generation
-            with open(metadata_file, "w") as f:
-                json.dump(all_metadata, f, indent=2)
+            if metrics_file:
+                write_metrics(metrics_file)
 
     print(f"\n{'='*60}")
     print(f"Batch generation complete!")
     print(f"Generated {total} images")
-    print(f"Metadata saved to: {metadata_file}")
+    print(f"Metadata saved to: {metadata_store.journal_path}")
     print(f"{'='*60}\n")
 
 
@@ -144,6 +175,20 @@ def main():
         help="Output directory (default: /app/generated_images)"
     )
 
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for reproducible, non-repeating prompt selection (default: random)"
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Write Prometheus metrics to this file after each image (e.g. for node_exporter textfile collector)"
+    )
+
     args = parser.parse_args()
 
     # Parse scenarios
@@ -160,7 +205,7 @@ def main():
                 print(f"Warning: Unknown scenario '{s}'")
 
     # Run generation
-    asyncio.run(generate_batch(scenarios, args.count, args.output))
+    asyncio.run(generate_batch(scenarios, args.count, args.output, args.seed, args.metrics_file))
 
 
 if __name__ == "__main__":
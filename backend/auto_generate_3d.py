@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Automated 3D world generation script.
+Run this to backfill 3D worlds for panoramas already in the metadata index.
+
+Progress is checkpointed to a journal in the worlds directory, so an
+interrupted run can be restarted with the same arguments and picks up
+where it stopped.
+"""
+
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fast_json import dumps, loads
+from metadata_store import MetadataStore
+from metrics import JOBS_TOTAL, StageTimer, write_metrics
+from static_files import precompress
+from storage import ImageStorage
+from world_generator import HunyuanWorldGenerator
+from world_store import WorldStore
+
+
+class Checkpoint:
+    """
+    Append-only record of finished images ("done" or "failed"), one JSON
+    line per image. The last line for an image wins.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    self.status[entry["image_id"]] = entry
+
+    def ids(self, status: str) -> Set[str]:
+        return {image_id for image_id, entry in self.status.items() if entry["status"] == status}
+
+    def mark(self, image_id: str, status: str, error: Optional[str] = None):
+        entry = {"image_id": image_id, "status": status, "at": datetime.utcnow().isoformat()}
+        if error:
+            entry["error"] = error
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(dumps(entry) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.status[image_id] = entry
+
+
+def select_images(
+    metadata_store: MetadataStore,
+    world_store: WorldStore,
+    checkpoint: Checkpoint,
+    scenarios: Optional[List[str]] = None,
+    retry_failed: bool = False,
+    force: bool = False,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """
+    Images that still need a world, newest first.
+
+    Skips images already in the worlds index, images the checkpoint marks
+    as failed (unless retry_failed) and panoramas that failed the quality
+    check (unless force, same as /api/generate-3d).
+    """
+    done = world_store.image_ids()
+    failed = set() if retry_failed else checkpoint.ids("failed")
+
+    selected = []
+    for record in metadata_store.all():
+        if scenarios and record.get("scenario") not in scenarios:
+            continue
+        if record["id"] in done or record["id"] in failed:
+            continue
+        quality = record.get("quality")
+        if quality and not quality.get("passed", True) and not force:
+            continue
+        selected.append(record)
+        if limit and len(selected) >= limit:
+            break
+    return selected
+
+
+def generate_single_world(
+    world_gen: HunyuanWorldGenerator,
+    storage: ImageStorage,
+    image: dict,
+    worlds_dir: str = "/app/generated_worlds"
+) -> dict:
+    """Generate (or pick up an existing) world for one image"""
+
+    image_id = image["id"]
+    scenario = image.get("scenario", "")
+    world_id = f"world_{image_id}"
+    output_dir = os.path.join(worlds_dir, world_id)
+
+    timer = StageTimer("world_batch")
+
+    # A world written by the API, or by a run that died before indexing
+    # it, only needs to be uploaded and recorded
+    glb_path = world_gen.find_glb(output_dir)
+    generated = glb_path is None
+    if not generated:
+        print(f"[{image_id}] Found existing world: {glb_path}")
+    else:
+        panorama_path = storage.ensure_local_image(image_id)
+        if not os.path.exists(panorama_path):
+            raise Exception(f"Panorama image not found: {image_id}")
+
+        classes = world_gen.get_scene_class(scenario)
+        fg1, fg2 = world_gen.get_foreground_labels(scenario)
+
+        print(f"[{image_id}] Generating 3D world (class: {classes}, FG labels: {fg1}, {fg2})")
+        glb_path = world_gen.generate_3d_world(
+            panorama_path=panorama_path,
+            output_path=output_dir,
+            classes=classes,
+            labels_fg1=fg1,
+            labels_fg2=fg2,
+            timer=timer
+        )
+
+        with timer.span("precompress"):
+            precompress(glb_path)
+
+    with timer.span("upload"):
+        world_url = storage.upload_world(glb_path, world_id)
+
+    # World3DResponse fields
+    return {
+        "id": world_id,
+        "image_id": image_id,
+        "world_url": world_url,
+        "created_at": datetime.utcnow().isoformat(),
+        "scenario": scenario,
+        "size_bytes": os.path.getsize(glb_path),
+        "generation_time": timer.total if generated else None,
+    }
+
+
+def generate_worlds_batch(
+    scenarios: Optional[List[str]] = None,
+    images_dir: str = "/app/generated_images",
+    worlds_dir: str = "/app/generated_worlds",
+    workers: int = 1,
+    limit: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    retry_failed: bool = False,
+    force: bool = False,
+    metrics_file: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Generate worlds for every selected image, `workers` at a time.
+
+    Returns:
+        Counts of "completed", "failed" and "selected" images
+    """
+
+    # Initialize components
+    print("Initializing generator...")
+    world_gen = HunyuanWorldGenerator()
+    if not world_gen.is_available():
+        raise SystemExit("HunyuanWorld is not installed. Run install_hunyuan.sh first.")
+    storage = ImageStorage(images_dir=images_dir, worlds_dir=worlds_dir)
+
+    os.makedirs(worlds_dir, exist_ok=True)
+
+    # Shared journals with the API server
+    metadata_store = MetadataStore(images_dir)
+    world_store = WorldStore(worlds_dir)
+    if not world_store.exists():
+        world_store.rebuild(
+            world_gen.find_glb,
+            storage.get_world_url,
+            lambda image_id: (metadata_store.get(image_id) or {}).get("scenario", ""),
+        )
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(worlds_dir, ".auto_generate_3d.jsonl"))
+
+    images = select_images(metadata_store, world_store, checkpoint, scenarios, retry_failed, force, limit)
+    total = len(images)
+
+    print(f"\n{'='*60}")
+    print(f"Starting batch 3D generation")
+    print(f"Scenarios: {scenarios or 'all'}")
+    print(f"Images in index: {len(metadata_store)}, with worlds: {len(world_store)}")
+    print(f"Worlds to generate: {total} ({workers} worker(s))")
+    print(f"{'='*60}\n")
+
+    counts = {"selected": total, "completed": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def run(image: dict):
+        image_id = image["id"]
+        try:
+            world = generate_single_world(world_gen, storage, image, worlds_dir)
+            world_store.add(world)
+            checkpoint.mark(image_id, "done")
+            JOBS_TOTAL.inc(kind="world_batch", outcome="completed")
+            outcome = "completed"
+            print(f"[{image_id}] World ready: {world['world_url']}")
+        except Exception as e:
+            # One bad panorama must not stop the backfill
+            checkpoint.mark(image_id, "failed", str(e))
+            JOBS_TOTAL.inc(kind="world_batch", outcome="failed")
+            outcome = "failed"
+            print(f"[{image_id}] 3D generation error: {e}")
+
+        with counts_lock:
+            counts[outcome] += 1
+            finished = counts["completed"] + counts["failed"]
+            if metrics_file:
+                write_metrics(metrics_file)
+        print(f"\nProgress: {finished}/{total}")
+
+    # HunyuanWorld runs as a subprocess, so threads are enough to overlap worlds
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(run, image) for image in images]):
+            future.result()
+
+    print(f"\n{'='*60}")
+    print(f"Batch 3D generation complete!")
+    print(f"Generated {counts['completed']} worlds, {counts['failed']} failed")
+    print(f"Worlds index: {world_store.journal_path}")
+    print(f"Checkpoint: {checkpoint.path}")
+    print(f"{'='*60}\n")
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Automated 3D world generation for existing panoramas")
+
+    parser.add_argument(
+        "--scenarios",
+        type=str,
+        default="all",
+        help="Comma-separated scenarios or 'all' (default: all)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WORLD_BATCH_WORKERS", "1")),
+        help="Worlds generated in parallel (default: $WORLD_BATCH_WORKERS or 1)"
+    )
+
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Generate at most this many worlds (default: all pending)"
+    )
+
+    parser.add_argument(
+        "--images-dir",
+        type=str,
+        default=os.getenv("IMAGES_DIR", "/app/generated_images"),
+        help="Panorama directory with the metadata index (default: $IMAGES_DIR or /app/generated_images)"
+    )
+
+    parser.add_argument(
+        "--worlds-dir",
+        type=str,
+        default=os.getenv("WORLDS_DIR", "/app/generated_worlds"),
+        help="3D worlds directory (default: $WORLDS_DIR or /app/generated_worlds)"
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="Progress journal (default: <worlds-dir>/.auto_generate_3d.jsonl)"
+    )
+
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Retry images that failed in a previous run"
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Include panoramas that failed the quality check"
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Write Prometheus metrics to this file after each world (e.g. for node_exporter textfile collector)"
+    )
+
+    args = parser.parse_args()
+
+    scenarios = None
+    if args.scenarios != "all":
+        scenarios = [s.strip() for s in args.scenarios.split(",")]
+
+    counts = generate_worlds_batch(
+        scenarios, args.images_dir, args.worlds_dir, args.workers, args.limit,
+        args.checkpoint, args.retry_failed, args.force, args.metrics_file
+    )
+    if counts["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
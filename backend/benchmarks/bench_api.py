@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+End-to-end API benchmark with fake model backends.
+
+Starts the FastAPI app in-process (uvicorn on a free local port) with the
+CPU fakes from fakes.py, drives it from concurrent client threads
+(submit, poll, list, get, delete, optionally 3D) and prints a JSON report
+with p50/p95/p99 latency per operation and completed jobs per second.
+
+Usage:
+    python benchmarks/bench_api.py --clients 8 --duration 30 --output run.json
+    python benchmarks/bench_api.py --compare run.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Thread-safe latency/error collection per operation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+
+    def record(self, op: str, seconds: float, ok: bool):
+        with self.lock:
+            self.latencies[op].append(seconds)
+            if not ok:
+                self.errors[op] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        ops = {}
+        for op, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            ops[op] = {
+                "count": len(values),
+                "errors": self.errors.get(op, 0),
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        return ops
+
+
+class Client:
+    def __init__(self, base_url: str, recorder: Recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+
+    def request(self, op: str, method: str, path: str, body: Optional[dict] = None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"} if data else {},
+        )
+
+        start = time.perf_counter()
+        status = 0
+        payload = None
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                status = resp.status
+                payload = resp.read()
+        except urllib.error.HTTPError as e:
+            status = e.code
+            payload = e.read()
+        except OSError:
+            status = 0
+        elapsed = time.perf_counter() - start
+
+        self.recorder.record(op, elapsed, 200 <= status < 300)
+        if payload and status and payload[:1] in (b"{", b"["):
+            return status, json.loads(payload)
+        return status, None
+
+    def wait_for_job(self, job_id: str, poll_interval: float, timeout: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status, job = self.request("poll", "GET", f"/api/jobs/{job_id}")
+            if status == 200 and job["status"] in ("completed", "failed"):
+                return job
+            time.sleep(poll_interval)
+        return None
+
+
+def client_loop(client: Client, rng: random.Random, stop_at: float, args):
+    recorder = client.recorder
+    owned: List[str] = []
+
+    while time.monotonic() < stop_at:
+        status, job = client.request("submit", "POST", "/api/generate", {"scenario": "random"})
+        if status != 200:
+            time.sleep(args.poll_interval)
+            continue
+
+        job = client.wait_for_job(job["job_id"], args.poll_interval, args.job_timeout)
+        with recorder.lock:
+            if job and job["status"] == "completed":
+                recorder.jobs_completed += 1
+            else:
+                recorder.jobs_failed += 1
+        if not job or job["status"] != "completed":
+            continue
+
+        image_id = job["result"]["id"]
+        owned.append(image_id)
+
+        client.request("get", "GET", f"/api/images/{image_id}")
+        if rng.random() < args.list_ratio:
+            client.request("list", "GET", "/api/images")
+
+        if rng.random() < args.world_ratio:
+            status, world_job = client.request("submit_3d", "POST", "/api/generate-3d", {"image_id": image_id})
+            if status == 200:
+                client.wait_for_job(world_job["job_id"], args.poll_interval, args.job_timeout)
+
+        if rng.random() < args.delete_ratio and owned:
+            client.request("delete", "DELETE", f"/api/images/{owned.pop(0)}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int):
+    import uvicorn
+    import fakes
+
+    fakes.install()
+    import main
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("API server did not start")
+        time.sleep(0.05)
+
+    return server, thread
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="island-bench-")
+    os.environ["IMAGES_DIR"] = os.path.join(workdir, "images")
+    os.environ["WORLDS_DIR"] = os.path.join(workdir, "worlds")
+    os.environ["BENCH_DIFFUSION_LATENCY"] = str(args.diffusion_latency)
+    os.environ["BENCH_WORLD_LATENCY"] = str(args.world_latency)
+    # Always benchmark local storage, never a real bucket
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME"):
+        os.environ.pop(key, None)
+    # Measure the pipeline, not admission control (unless explicitly configured)
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("MAX_QUEUE_DEPTH", "0")
+
+    port = free_port()
+    os.environ["PUBLIC_URL"] = f"http://127.0.0.1:{port}"
+    server, thread = start_server(port)
+
+    recorder = Recorder()
+    base_url = f"http://127.0.0.1:{port}"
+
+    # Warm up so import/first-request costs don't skew the run
+    Client(base_url, Recorder()).request("warmup", "GET", "/api/health")
+
+    start = time.monotonic()
+    stop_at = start + args.duration
+    threads = []
+    for i in range(args.clients):
+        client = Client(base_url, recorder)
+        rng = random.Random(args.seed + i)
+        t = threading.Thread(target=client_loop, args=(client, rng, stop_at, args), daemon=True)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - start
+
+    server.should_exit = True
+    thread.join(timeout=10)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "benchmark": "api",
+        "git_revision": git_revision(),
+        "config": {
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "diffusion_latency_s": args.diffusion_latency,
+            "world_latency_s": args.world_latency,
+            "list_ratio": args.list_ratio,
+            "delete_ratio": args.delete_ratio,
+            "world_ratio": args.world_ratio,
+            "seed": args.seed,
+        },
+        "wall_s": wall,
+        "jobs_completed": recorder.jobs_completed,
+        "jobs_failed": recorder.jobs_failed,
+        "jobs_per_second": recorder.jobs_completed / wall if wall else 0.0,
+        "operations": recorder.summary(),
+    }
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Relative change of key figures versus a baseline report"""
+    diff = {"jobs_per_second": _ratio(current["jobs_per_second"], baseline["jobs_per_second"])}
+    for op, stats in current["operations"].items():
+        base = baseline["operations"].get(op)
+        if base:
+            diff[op] = {k: _ratio(stats[k], base[k]) for k in ("p50_ms", "p95_ms", "p99_ms")}
+    return diff
+
+
+def _ratio(current: float, baseline: float) -> Optional[float]:
+    if not baseline:
+        return None
+    return round((current - baseline) / baseline, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API benchmark with fake model backends")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads (default: 8)")
+    parser.add_argument("--duration", type=float, default=20, help="Load duration in seconds (default: 20)")
+    parser.add_argument("--diffusion-latency", type=float, default=0.05, help="Fake Flux latency in seconds")
+    parser.add_argument("--world-latency", type=float, default=0.2, help="Fake HunyuanWorld latency in seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.02, help="Job polling interval in seconds")
+    parser.add_argument("--job-timeout", type=float, default=60, help="Give up on a job after this many seconds")
+    parser.add_argument("--list-ratio", type=float, default=0.5, help="Probability of a list call per job")
+    parser.add_argument("--delete-ratio", type=float, default=0.3, help="Probability of a delete per job")
+    parser.add_argument("--world-ratio", type=float, default=0.0, help="Probability of a 3D job per image")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the per-client operation mix")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report to this file")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    # The app logs with print(); keep stdout clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["vs_baseline"] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
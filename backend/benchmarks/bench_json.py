@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Old vs new JSON paths for /api/images and the metadata snapshot.
+
+- list/pydantic:  List[ImageResponse] validation + jsonable_encoder + json
+                  (what FastAPI did with response_model on every request)
+- list/encode:    ImageRecord.to_response() + fast_json.dumps (presigned mode)
+- list/cached:    MetadataStore.encoded_responses() with no writes in between
+- snapshot/*:     json.dump(indent=2) vs compact fast_json, plus file sizes
+- http/*:         GET /api/images end to end through TestClient
+
+Usage:
+    python benchmarks/bench_json.py --records 10000
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_memory import make_record  # noqa: E402
+import fast_json  # noqa: E402
+from metadata_store import MetadataStore  # noqa: E402
+
+
+def timeit(func: Callable, repeat: int) -> dict:
+    func()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000}
+
+
+def build_store(directory: str, count: int) -> MetadataStore:
+    rng = random.Random(0)
+    records = [make_record(rng, i) for i in range(count)]
+    with open(os.path.join(directory, "metadata.json"), "wb") as f:
+        f.write(fast_json.dumps(list(reversed(records))))
+    return MetadataStore(directory)
+
+
+def bench_lists(store: MetadataStore, repeat: int) -> dict:
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import BaseModel, TypeAdapter
+
+    class ImageResponse(BaseModel):
+        id: str
+        prompt: str
+        image_url: str
+        created_at: str
+        scenario: str
+
+    adapter = TypeAdapter(List[ImageResponse])
+
+    def old_path():
+        validated = adapter.validate_python(store.all())
+        json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    def new_path():
+        fast_json.dumps(store.responses())
+
+    return {
+        "list/pydantic": timeit(old_path, repeat),
+        "list/encode": timeit(new_path, repeat),
+        "list/cached": timeit(store.encoded_responses, repeat),
+    }
+
+
+def bench_snapshot(store: MetadataStore, repeat: int) -> dict:
+    snapshot = store.all()
+
+    def old_dump():
+        buffer = io.StringIO()
+        json.dump(snapshot, buffer, indent=2)
+        return buffer.getvalue().encode("utf-8")
+
+    old_bytes = old_dump()
+    new_bytes = fast_json.dumps(snapshot)
+
+    return {
+        "snapshot/indent2": {**timeit(old_dump, repeat), "bytes": len(old_bytes)},
+        "snapshot/compact": {**timeit(lambda: fast_json.dumps(snapshot), repeat), "bytes": len(new_bytes)},
+    }
+
+
+def bench_http(directory: str, repeat: int) -> dict:
+    os.environ["IMAGES_DIR"] = directory
+    os.environ["WORLDS_DIR"] = os.path.join(directory, "worlds")
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "0"
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME"):
+        os.environ.pop(key, None)
+
+    import fakes
+    fakes.install()
+    import main
+    from fastapi.testclient import TestClient
+
+    # The previous handler, for comparison
+    @main.app.get("/bench/images-pydantic", response_model=List[main.ImageResponse])
+    async def images_pydantic():
+        return main.metadata.all()
+
+    with TestClient(main.app) as client:
+        new = client.get("/api/images")
+        old = client.get("/bench/images-pydantic")
+        assert new.json() == old.json(), "fast path changed the response"
+
+        return {
+            "http/pydantic": timeit(lambda: client.get("/bench/images-pydantic"), repeat),
+            "http/fast": timeit(lambda: client.get("/api/images"), repeat),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark old vs new JSON serialization paths")
+    parser.add_argument("--records", type=int, default=10_000, help="Image records (default: 10000)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions per case (default: 20)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="island-json-")
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        store = build_store(workdir, args.records)
+        results = {}
+        results.update(bench_lists(store, args.repeat))
+        results.update(bench_snapshot(store, args.repeat))
+        results.update(bench_http(workdir, args.repeat))
+    finally:
+        sys.stdout = real_stdout
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "json",
+        "records": args.records,
+        "orjson": fast_json.orjson is not None,
+        "results": {k: {m: round(v, 2) for m, v in r.items()} for k, r in results.items()},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
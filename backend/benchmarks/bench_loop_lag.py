@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Event-loop blocking check.
+
+Runs the API with the fake model backends, a deliberately slow "S3"
+(every call sleeps) and a slow metadata disk, drives list/get/delete/
+generate traffic at it, and reads the app's LoopLagMonitor. Any blocking
+call left on the event loop shows up as lag roughly equal to the injected
+latency.
+
+Exits non-zero if the worst observed lag exceeds --threshold, so it can
+gate CI:
+
+    python benchmarks/bench_loop_lag.py --latency 0.2 --threshold 0.05
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from bench_api import Client, Recorder, free_port, start_server
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from storage_backends import MemoryBackend  # noqa: E402
+
+
+class SlowBackend(MemoryBackend):
+    """MemoryBackend where every call costs `latency` seconds, like a slow bucket"""
+
+    def __init__(self, latency: float):
+        super().__init__("https://slow-bucket.example.com/")
+        self.latency = latency
+
+    def put(self, key, data, content_type=None):
+        time.sleep(self.latency)
+        super().put(key, data, content_type)
+
+    def delete(self, key):
+        time.sleep(self.latency)
+        return super().delete(key)
+
+    def exists(self, key):
+        time.sleep(self.latency)
+        return super().exists(key)
+
+    def url(self, key, min_valid=0):
+        time.sleep(self.latency / 10)
+        return super().url(key, min_valid)
+
+
+def slow_down_metadata(metadata, latency: float):
+    """Make every journal refresh (done on each read) cost `latency` seconds"""
+    refresh = metadata.refresh
+
+    def slow_refresh():
+        time.sleep(latency)
+        refresh()
+
+    metadata.refresh = slow_refresh
+
+
+def client_loop(client: Client, rng: random.Random, stop_at: float):
+    owned = []
+    while time.monotonic() < stop_at:
+        status, job = client.request("submit", "POST", "/api/generate", {"scenario": "random"})
+        if status == 200:
+            job = client.wait_for_job(job["job_id"], 0.05, 30)
+            if job and job["status"] == "completed":
+                owned.append(job["result"]["id"])
+
+        client.request("list", "GET", "/api/images")
+        if owned:
+            client.request("get", "GET", f"/api/images/{rng.choice(owned)}")
+        if len(owned) > 2:
+            client.request("delete", "DELETE", f"/api/images/{owned.pop(0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if API handlers block the event loop")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent client threads (default: 4)")
+    parser.add_argument("--duration", type=float, default=10, help="Load duration in seconds (default: 10)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Injected S3/disk latency in seconds")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Max tolerated loop lag in seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="island-looplag-")
+    os.environ["IMAGES_DIR"] = os.path.join(workdir, "images")
+    os.environ["WORLDS_DIR"] = os.path.join(workdir, "worlds")
+    os.environ["BENCH_DIFFUSION_LATENCY"] = "0.01"
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("MAX_QUEUE_DEPTH", "0")
+    os.environ["LOOP_LAG_THRESHOLD"] = str(args.threshold)
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME", "CDN_BASE_URL"):
+        os.environ.pop(key, None)
+
+    port = free_port()
+    os.environ["PUBLIC_URL"] = f"http://127.0.0.1:{port}"
+
+    # Keep the app's logging out of the JSON report
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        server, thread = start_server(port)
+
+        import main as app_main
+        app_main.storage.remote = SlowBackend(args.latency)
+        app_main.storage.use_s3 = True
+        slow_down_metadata(app_main.metadata, args.latency)
+
+        monitor = app_main.loop_monitor
+        recorder = Recorder()
+        base_url = f"http://127.0.0.1:{port}"
+        stop_at = time.monotonic() + args.duration
+
+        monitor.reset()
+        threads = [
+            threading.Thread(target=client_loop, args=(Client(base_url, recorder), random.Random(i), stop_at))
+            for i in range(args.clients)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        lags = sorted(monitor.recent)
+        server.should_exit = True
+        thread.join(timeout=10)
+    finally:
+        sys.stdout = real_stdout
+
+    report = {
+        "benchmark": "loop_lag",
+        "config": vars(args),
+        "heartbeats": len(lags),
+        "max_lag_ms": monitor.max_lag * 1000,
+        "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+        "stalls": monitor.stalls,
+        "operations": recorder.summary(),
+        "passed": monitor.max_lag <= args.threshold,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
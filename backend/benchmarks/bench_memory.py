@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Resident memory per 100k image records and finished jobs.
+
+Each case runs in a fresh subprocess and reports the RSS growth (VmRSS from
+/proc) after building N records, scaled to 100k:
+
+- images/dicts:   metadata index as plain dicts (previous layout)
+- images/records: MetadataStore with ImageRecord slots objects
+- jobs/dicts:     unbounded `jobs` dict holding a copy of every result
+- jobs/store:     JobStore (slots Job objects, bounded history, SQLite)
+
+Usage:
+    python benchmarks/bench_memory.py --records 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+CASES = ("images/dicts", "images/records", "jobs/dicts", "jobs/store")
+SCENARIOS = ("beach", "jungle", "mountain", "cave", "ruins", "storm", "sunset", "night")
+WORDS = ("tropical", "island", "shipwreck", "palm", "lagoon", "volcanic", "mist", "golden", "hour",
+         "dense", "ancient", "overgrown", "cinematic", "equirectangular", "360", "panorama")
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("VmRSS not available")
+
+
+def make_record(rng: random.Random, i: int) -> dict:
+    image_id = f"{1731000000 + i}_{rng.getrandbits(32):08x}"
+    return {
+        "id": image_id,
+        "prompt": " ".join(rng.choice(WORDS) for _ in range(30)),
+        "image_url": f"https://cdn.example.com/{image_id}.png",
+        "created_at": datetime.utcfromtimestamp(1731000000 + i).isoformat(),
+        "scenario": rng.choice(SCENARIOS),
+    }
+
+
+def make_timings(rng: random.Random) -> dict:
+    stages = ("prompt", "diffusion", "encode", "save", "upload", "metadata_commit")
+    return {stage: rng.random() for stage in stages}
+
+
+def write_snapshot(directory: str, count: int):
+    rng = random.Random(0)
+    records = [make_record(rng, i) for i in range(count)]
+    with open(os.path.join(directory, "metadata.json"), "w") as f:
+        json.dump(list(reversed(records)), f)
+
+
+def run_case(case: str, count: int, workdir: str) -> int:
+    """Build `count` entries for case; returns RSS growth in bytes"""
+    rng = random.Random(1)
+    gc.collect()
+    before = rss_bytes()
+
+    if case == "images/dicts":
+        with open(os.path.join(workdir, "metadata.json")) as f:
+            snapshot = json.load(f)
+        held = {record["id"]: record for record in reversed(snapshot)}
+        del snapshot
+
+    elif case == "images/records":
+        from metadata_store import MetadataStore
+        held = MetadataStore(workdir)
+
+    elif case == "jobs/dicts":
+        held = {}
+        for i in range(count):
+            job_id = str(uuid.uuid4())
+            held[job_id] = {
+                "job_id": job_id,
+                "status": "completed",
+                "created_at": datetime.utcnow().isoformat(),
+                "scenario": rng.choice(SCENARIOS),
+                "completed_at": datetime.utcnow().isoformat(),
+                "result": dict(make_record(rng, i)),
+                "error": None,
+                "timings": make_timings(rng),
+                "profile_id": None,
+            }
+
+    elif case == "jobs/store":
+        from job_store import JobStatus, JobStore
+        held = JobStore(os.path.join(workdir, "jobs.db"))
+        for i in range(count):
+            job = held.create("image", rng.choice(SCENARIOS))
+            job.timings = make_timings(rng)
+            held.finish(job, JobStatus.COMPLETED, result=make_record(rng, i))
+
+    else:
+        raise ValueError(f"Unknown case {case}")
+
+    gc.collect()
+    growth = rss_bytes() - before
+    del held
+    return growth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS per 100k image records and finished jobs")
+    parser.add_argument("--records", type=int, default=100_000, help="Entries per case (default: 100000)")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Child process: measure one case and print the RSS growth
+        print(run_case(args.case, args.records, args.workdir))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="island-mem-") as workdir:
+        write_snapshot(workdir, args.records)
+        for case in CASES:
+            case_dir = os.path.join(workdir, case.replace("/", "_"))
+            os.makedirs(case_dir)
+            os.link(os.path.join(workdir, "metadata.json"), os.path.join(case_dir, "metadata.json"))
+            out = subprocess.check_output(
+                [sys.executable, __file__, "--case", case, "--records", str(args.records), "--workdir", case_dir],
+                stderr=subprocess.DEVNULL, text=True,
+            )
+            growth = int(out.strip().splitlines()[-1])
+            results[case] = round(growth * 100_000 / args.records / 1024 ** 2, 1)
+
+    report = {
+        "benchmark": "memory",
+        "records": args.records,
+        "rss_mb_per_100k": results,
+        "images_ratio": round(results["images/records"] / results["images/dicts"], 2),
+        "jobs_ratio": round(results["jobs/store"] / results["jobs/dicts"], 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark MetadataStore startup replay and append throughput.
+
+Usage:
+    python benchmarks/bench_metadata.py --records 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from metadata_store import MetadataStore  # noqa: E402
+
+
+def make_record(i: int) -> dict:
+    return {
+        "id": str(1700000000 + i),
+        "prompt": f"pristine tropical beach with white sand, clear sunny day, serene atmosphere #{i}",
+        "image_url": f"http://localhost:8000/images/{1700000000 + i}.png",
+        "created_at": "2025-11-09T00:00:00",
+        "scenario": "beach",
+    }
+
+
+def bench(records: int) -> dict:
+    results = {"records": records}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Appends (no compaction, so replay below covers a pure journal)
+        store = MetadataStore(tmp, compact_threshold=1 << 62)
+        start = time.perf_counter()
+        for i in range(records):
+            store.add(make_record(i))
+        elapsed = time.perf_counter() - start
+        results["append_total_s"] = elapsed
+        results["append_us_per_record"] = elapsed / records * 1e6
+        results["journal_bytes"] = os.path.getsize(store.journal_path)
+
+        # Replay from journal only
+        start = time.perf_counter()
+        replayed = MetadataStore(tmp, compact_threshold=1 << 62)
+        results["replay_journal_s"] = time.perf_counter() - start
+        assert len(replayed) == records
+
+        # Compact, then replay from snapshot only
+        start = time.perf_counter()
+        replayed.compact()
+        results["compact_s"] = time.perf_counter() - start
+        results["snapshot_bytes"] = os.path.getsize(replayed.snapshot_path)
+
+        start = time.perf_counter()
+        from_snapshot = MetadataStore(tmp, compact_threshold=1 << 62)
+        results["replay_snapshot_s"] = time.perf_counter() - start
+        assert len(from_snapshot) == records
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata journal benchmark")
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(json.dumps(bench(args.records), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Time to first image with and without fast-preview mode.
+
+Submits jobs through the API (fake model backends, where a render costs
+BENCH_DIFFUSION_LATENCY scaled by steps x pixels) and polls each job until
+its preview and then its final image are viewable. Reports, per tier:
+
+- first_image_s:  median seconds from submit to the first viewable image
+- final_s:        median seconds from submit to the final image
+- saved_s:        how much sooner the user sees something than without preview
+- overhead_s:     extra time the preview adds to the final image
+
+Usage:
+    python benchmarks/bench_preview.py --latency 2.0 --tiers 4:512 8:1024 16:1024
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_api import Client, Recorder, free_port, start_server
+
+
+def run_job(client: Client, body: dict, poll: float) -> dict:
+    start = time.perf_counter()
+    _, job = client.request("submit", "POST", "/api/generate", body)
+    job_id = job["job_id"]
+    first = None
+    while True:
+        _, job = client.request("poll", "GET", f"/api/jobs/{job_id}")
+        now = time.perf_counter() - start
+        if first is None and job.get("preview") and job["preview"]["image_url"]:
+            first = now
+        if job["status"] in ("completed", "failed"):
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            return {"first": first if first is not None else now, "final": now}
+        time.sleep(poll)
+
+
+def summarize(samples) -> dict:
+    return {
+        "first_image_s": round(statistics.median(s["first"] for s in samples), 3),
+        "final_s": round(statistics.median(s["final"] for s in samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first image per preview tier")
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="Fake cost of a full 50-step 2048x1024 render in seconds (default: 2.0)")
+    parser.add_argument("--tiers", nargs="+", default=["4:512", "8:1024", "16:1024"],
+                        help="Preview tiers as steps:width (default: 4:512 8:1024 16:1024)")
+    parser.add_argument("--jobs", type=int, default=3, help="Jobs per tier (default: 3)")
+    parser.add_argument("--poll", type=float, default=0.02, help="Job poll interval in seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="island-preview-")
+    os.environ["IMAGES_DIR"] = os.path.join(workdir, "images")
+    os.environ["WORLDS_DIR"] = os.path.join(workdir, "worlds")
+    os.environ["BENCH_DIFFUSION_LATENCY"] = str(args.latency)
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "0"
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME"):
+        os.environ.pop(key, None)
+
+    port = free_port()
+    os.environ["PUBLIC_URL"] = f"http://127.0.0.1:{port}"
+
+    # Keep the app's logging out of the JSON report
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        server, thread = start_server(port)
+        import main as app_main
+
+        client = Client(f"http://127.0.0.1:{port}", Recorder())
+        results = {}
+        baseline = summarize([run_job(client, {}, args.poll) for _ in range(args.jobs)])
+        results["full"] = {"steps": 50, "width": 2048, **baseline}
+
+        for tier in args.tiers:
+            steps, width = (int(v) for v in tier.split(":"))
+            body = {"preview": True, "preview_steps": steps, "preview_width": width}
+            summary = summarize([run_job(client, body, args.poll) for _ in range(args.jobs)])
+            results[f"preview/{tier}"] = {
+                "steps": steps,
+                "width": width,
+                **summary,
+                "saved_s": round(baseline["first_image_s"] - summary["first_image_s"], 3),
+                "overhead_s": round(summary["final_s"] - baseline["final_s"], 3),
+            }
+
+        histogram = [line for line in app_main.REGISTRY.render().splitlines()
+                     if line.startswith("island_time_to_image_seconds_count")]
+
+        server.should_exit = True
+        thread.join(timeout=10)
+    finally:
+        sys.stdout = real_stdout
+
+    report = {
+        "benchmark": "preview",
+        "config": vars(args),
+        "results": results,
+        "metrics": histogram,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Panorama quality check: detection accuracy, cost and retry behaviour.
+
+Scores synthetic panoramas with known defects and checks the gate flags
+exactly the broken ones:
+
+- good:     seamless smooth noise (what the fake generator renders)
+- seam:     textured noise whose left and right edges don't wrap
+- blank:    near-uniform frame with a little sensor-like noise
+- pole:     a good panorama with fine detail in the top rows
+
+Also times score_panorama() at several resolutions and runs QualityGate
+against a renderer whose first attempts are broken, to show the retry.
+
+Exits non-zero on any misclassification:
+
+    python benchmarks/bench_quality.py --samples 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import FakeFluxPanoramaGenerator  # noqa: E402
+from quality import QualityGate, score_panorama  # noqa: E402
+
+
+def good(rng: np.random.Generator, width: int) -> Image.Image:
+    generator = FakeFluxPanoramaGenerator()
+    generator.latency = 0
+    return generator.generate(f"sample {rng.integers(1 << 30)}", width, width // 2, seed=int(rng.integers(1 << 30)))
+
+
+def seam(rng: np.random.Generator, width: int) -> Image.Image:
+    coarse = Image.fromarray(rng.integers(0, 256, (16, 32, 3), dtype=np.uint8))
+    pixels = np.asarray(coarse.resize((width, width // 2), Image.BICUBIC), dtype=np.float32)
+    pixels += rng.normal(0, 6, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def blank(rng: np.random.Generator, width: int) -> Image.Image:
+    pixels = np.full((width // 2, width, 3), rng.integers(0, 256), dtype=np.float32)
+    pixels += rng.normal(0, 2, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def pole(rng: np.random.Generator, width: int) -> Image.Image:
+    pixels = np.asarray(good(rng, width), dtype=np.float32).copy()
+    rows = width // 2 // 25
+    pixels[:rows] += rng.normal(0, 60, pixels[:rows].shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+CASES = {"good": (good, []), "seam": (seam, ["seam"]), "blank": (blank, ["variance"]), "pole": (pole, ["pole"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check panorama quality scoring and retry")
+    parser.add_argument("--samples", type=int, default=50, help="Images per case (default: 50)")
+    parser.add_argument("--width", type=int, default=1024, help="Sample width (default: 1024)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gate = QualityGate(max_attempts=3)
+    gate.enabled = True
+
+    detection = {}
+    errors = []
+    for name, (make, expected) in CASES.items():
+        scores = [score_panorama(make(rng, args.width)) for _ in range(args.samples)]
+        # good: any failure is wrong; defects: the expected check must fire
+        wrong = sum(1 for s in scores if bool(gate.failures(s)) != bool(expected)
+                    or any(e not in gate.failures(s) for e in expected))
+        detection[name] = {
+            "misclassified": wrong,
+            **{key: {"min": min(s[key] for s in scores), "max": max(s[key] for s in scores)}
+               for key in ("seam", "pole", "std")},
+        }
+        if wrong:
+            errors.append(f"{name}: {wrong}/{args.samples} misclassified")
+
+    timing = {}
+    for width in (2048, 4096, 8192):
+        image = good(rng, width)
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            score_panorama(image)
+            samples.append(time.perf_counter() - start)
+        timing[f"{width}x{width // 2}"] = round(statistics.median(samples) * 1000, 2)
+
+    # Two broken renders, then a good one
+    renders = iter([blank(rng, args.width), seam(rng, args.width), good(rng, args.width)])
+    real_stdout, sys.stdout = sys.stdout, sys.stderr  # keep the gate's log out of the report
+    try:
+        _, quality = gate.generate(lambda seed: next(renders))
+    finally:
+        sys.stdout = real_stdout
+    if not (quality["passed"] and quality["attempts"] == 3):
+        errors.append(f"retry: expected a pass on attempt 3, got {quality}")
+
+    report = {
+        "benchmark": "quality",
+        "config": vars(args),
+        "thresholds": {"max_seam": gate.max_seam, "max_pole": gate.max_pole, "min_std": gate.min_std},
+        "detection": detection,
+        "score_ms": timing,
+        "retry": quality,
+        "errors": errors,
+        "passed": not errors,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
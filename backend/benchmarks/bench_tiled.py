@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tiled panorama rendering on CPU with a fake denoiser.
+
+Checks, for each output width:
+
+- identity_error:  mean |tiled - plain resize| with an identity refiner;
+                   blending must reproduce the upscaled base (< 1.5 levels)
+- seam_ratio:      left/right edge difference relative to neighbouring
+                   columns elsewhere, on a base that does NOT wrap; ~1 means
+                   the seam is as smooth as the rest (< 2.0)
+- boundary_ratio:  same measure at tile starts with a FakeDenoiser that
+                   shifts each tile's brightness; visible tile edges push
+                   this up (< 2.0)
+- max_tile_px:     largest image the denoiser saw (must equal tile_size^2)
+
+and reports time and the numpy working set (tracemalloc peak; the output
+PIL image is not counted) next to what one full-size float accumulator
+would need.
+
+Exits non-zero if any check fails:
+
+    python benchmarks/bench_tiled.py --widths 2048 4096 8192
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import FakeDenoiser  # noqa: E402
+from tiled_panorama import TiledPanoramaRenderer, blend_seam, seam_error  # noqa: E402
+
+
+def make_base(width: int, seed: int = 0) -> Image.Image:
+    """Smooth random panorama with a deliberate left/right discontinuity"""
+    rng = np.random.default_rng(seed)
+    coarse = Image.fromarray(rng.integers(0, 256, (16, 32, 3), dtype=np.uint8))
+    smooth = np.asarray(coarse.resize((width, width // 2), Image.BICUBIC), dtype=np.float32)
+    ramp = np.linspace(-40, 40, width, dtype=np.float32)[None, :, None]
+    return Image.fromarray(np.clip(smooth + ramp, 0, 255).astype(np.uint8))
+
+
+def boundary_ratio(image: Image.Image, xs) -> float:
+    pixels = np.asarray(image, dtype=np.float32)
+    diffs = np.abs(np.diff(pixels, axis=1)).mean(axis=(0, 2))
+    at_edges = [diffs[(x - 1) % len(diffs)] for x in xs if x > 0]
+    return float(np.mean(at_edges) / max(diffs.mean(), 1e-6))
+
+
+def run(width: int, base_width: int, tile_size: int, overlap: int) -> dict:
+    height = width // 2
+    base = make_base(base_width)
+
+    # Identity refine vs one plain resize of the seam-fixed base
+    identity = TiledPanoramaRenderer(lambda tile: tile, tile_size, overlap)
+    tiled = identity.render(base, width, height)
+    seam_band = -(-overlap * base_width // width)
+    reference = blend_seam(base, seam_band).resize((width, height), Image.LANCZOS)
+    identity_error = float(np.abs(
+        np.asarray(tiled, dtype=np.float32) - np.asarray(reference, dtype=np.float32)
+    ).mean())
+
+    # Disagreeing tiles: timing, memory, seam and tile-edge visibility
+    denoiser = FakeDenoiser(strength=8.0)
+    renderer = TiledPanoramaRenderer(denoiser, tile_size, overlap)
+    plan = renderer.plan(width, height)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    image = renderer.render(base, width, height)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "width": width,
+        "height": height,
+        "tiles": len(plan),
+        "seconds": round(elapsed, 2),
+        "working_mb": round(peak / 1024 ** 2, 1),
+        "full_accumulator_mb": round(width * height * 16 / 1024 ** 2, 1),
+        "max_tile_px": denoiser.max_pixels,
+        "identity_error": round(identity_error, 3),
+        "base_seam_ratio": round(seam_error(base), 2),
+        "seam_ratio": round(seam_error(image), 2),
+        "boundary_ratio": round(boundary_ratio(image, sorted({x for x, _, _, _ in plan})), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check tiled panorama blending and memory on CPU")
+    parser.add_argument("--widths", type=int, nargs="+", default=[2048, 4096, 8192], help="Output widths")
+    parser.add_argument("--base-width", type=int, default=1024, help="Base panorama width (default: 1024)")
+    parser.add_argument("--tile-size", type=int, default=512, help="Tile edge (default: 512)")
+    parser.add_argument("--overlap", type=int, default=64, help="Tile overlap (default: 64)")
+    args = parser.parse_args()
+
+    results = [run(width, args.base_width, args.tile_size, args.overlap) for width in args.widths]
+    failures = [
+        f"{r['width']}: {name}"
+        for r in results
+        for name, ok in (
+            ("identity_error", r["identity_error"] < 1.5),
+            ("seam_ratio", r["seam_ratio"] < 2.0),
+            ("boundary_ratio", r["boundary_ratio"] < 2.0),
+            ("max_tile_px", r["max_tile_px"] == args.tile_size ** 2),
+        )
+        if not ok
+    ]
+
+    report = {
+        "benchmark": "tiled_panorama",
+        "config": {k: v for k, v in vars(args).items() if k != "widths"},
+        "results": results,
+        "failures": failures,
+        "passed": not failures,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
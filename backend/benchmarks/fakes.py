@@ -0,0 +1,135 @@
+"""
+Deterministic CPU stand-ins for the model backends.
+
+They keep the public interface of FluxPanoramaGenerator and
+HunyuanWorldGenerator but replace the GPU work with a configurable sleep,
+so the API and storage layers can be benchmarked on any machine.
+"""
+
+import hashlib
+import os
+import sys
+import time
+import types
+from typing import Optional
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tiled_panorama import TiledPanoramaRenderer  # noqa: E402
+from world_generator import HunyuanWorldGenerator  # noqa: E402
+
+
+class FakeDenoiser:
+    """
+    CPU stand-in for the img2img tile refiner.
+
+    Adds a deterministic per-tile brightness offset (derived from the tile's
+    pixels), so neighbouring tiles disagree the way real denoised tiles do
+    and blending/seam handling is actually exercised.
+    """
+
+    def __init__(self, strength: float = 8.0, latency: float = 0.0):
+        self.strength = strength
+        self.latency = latency
+        self.calls = 0
+        self.max_pixels = 0
+
+    def __call__(self, tile: Image.Image) -> Image.Image:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        self.max_pixels = max(self.max_pixels, tile.width * tile.height)
+        digest = hashlib.sha256(tile.tobytes()[:4096]).digest()
+        offset = (digest[0] / 255.0 * 2 - 1) * self.strength
+        return tile.point(lambda v: max(0, min(255, round(v + offset))))
+
+
+class FakeFluxPanoramaGenerator:
+    """
+    Returns a smooth, seamless noise panorama derived from the prompt and seed.
+
+    BENCH_DIFFUSION_LATENCY is the cost of a full render (50 steps at
+    2048x1024); other step counts and sizes scale it linearly, so preview
+    tiers are proportionally cheaper.
+    """
+
+    latency = float(os.getenv("BENCH_DIFFUSION_LATENCY", "0.05"))
+    width = int(os.getenv("BENCH_IMAGE_WIDTH", "256"))
+    height = int(os.getenv("BENCH_IMAGE_HEIGHT", "128"))
+
+    def __init__(self):
+        self.loaded = True
+
+    def generate(self, prompt: str, width: Optional[int] = None, height: Optional[int] = None,
+                 num_inference_steps: int = 50, **kwargs) -> Image.Image:
+        pixels = (width or 2048) * (height or 1024) / (2048 * 1024)
+        time.sleep(self.latency * num_inference_steps / 50 * pixels)
+        size = (width or self.width, height or self.height)
+        digest = hashlib.sha256(f"{prompt}:{kwargs.get('seed')}".encode("utf-8")).digest()
+        coarse = Image.frombytes("RGB", (8, 4), (digest * 3)[:96])
+
+        # Three copies side by side, keep the middle: left and right edges wrap
+        strip = Image.new("RGB", (24, 4))
+        for i in range(3):
+            strip.paste(coarse, (8 * i, 0))
+        wide = strip.resize((size[0] * 3, size[1]), Image.BICUBIC)
+        return wide.crop((size[0], 0, size[0] * 2, size[1]))
+
+    def generate_tiled(self, prompt: str, width: int = 4096, height: int = 2048, base_width: int = 2048,
+                       on_tile=None, **kwargs) -> Image.Image:
+        base = self.generate(prompt, width=min(base_width, width), height=min(base_width, width) * height // width)
+        return TiledPanoramaRenderer(FakeDenoiser(latency=self.latency / 10)).render(base, width, height, on_tile=on_tile)
+
+    def is_loaded(self) -> bool:
+        return self.loaded
+
+    def unload_model(self):
+        self.loaded = False
+
+
+class FakeHunyuanWorldGenerator(HunyuanWorldGenerator):
+    """Writes a small placeholder scene.glb instead of running HunyuanWorld"""
+
+    latency = float(os.getenv("BENCH_WORLD_LATENCY", "0.2"))
+    glb_bytes = int(os.getenv("BENCH_GLB_BYTES", str(256 * 1024)))
+
+    def __init__(self, catalog=None):
+        super().__init__(catalog)
+        self.available = True
+
+    def generate_3d_world(self, panorama_path: str, output_path: str, classes: str = "outdoor",
+                          labels_fg1: Optional[str] = None, labels_fg2: Optional[str] = None,
+                          timer=None) -> str:
+        os.makedirs(output_path, exist_ok=True)
+        glb_file = os.path.join(output_path, "scene.glb")
+
+        if timer:
+            with timer.span("world_subprocess"):
+                time.sleep(self.latency)
+        else:
+            time.sleep(self.latency)
+
+        # glTF binary header followed by deterministic padding
+        seed = hashlib.sha256(panorama_path.encode("utf-8")).digest()
+        with open(glb_file, "wb") as f:
+            f.write(b"glTF")
+            f.write((seed * (self.glb_bytes // len(seed) + 1))[: self.glb_bytes - 4])
+
+        return glb_file
+
+
+def install():
+    """
+    Make `import main` pick up the fake backends.
+
+    image_generator is replaced wholesale so torch/diffusers are never
+    imported; world_generator is patched in place.
+    """
+    image_module = types.ModuleType("image_generator")
+    image_module.FluxPanoramaGenerator = FakeFluxPanoramaGenerator
+    sys.modules["image_generator"] = image_module
+
+    import world_generator
+    world_generator.HunyuanWorldGenerator = FakeHunyuanWorldGenerator
@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, TypeVar
+
+import anyio
+
+from metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+
+T = TypeVar("T")
+
+# Blocking disk/S3 work from request handlers gets its own thread budget, so
+# it is never queued behind long generation jobs in the default threadpool.
+IO_LIMITER = anyio.CapacityLimiter(int(os.getenv("IO_THREADS", "16")))
+
+
+async def run_io(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking call (file I/O, S3, SQLite) off the event loop.
+
+    Args:
+        func: Blocking callable
+        *args, **kwargs: Passed to func
+
+    Returns:
+        func's return value (exceptions propagate)
+    """
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=IO_LIMITER)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs its callbacks.
+
+    A heartbeat task sleeps for `interval` and records how much later than
+    requested it woke up into a histogram. A watchdog thread notices when
+    the heartbeat is overdue by more than `threshold` and prints the loop
+    thread's stack while it is still blocked, which points straight at the
+    offending call.
+
+    Config (env):
+        LOOP_MONITOR: enable the monitor (default: on)
+        LOOP_MONITOR_INTERVAL: heartbeat interval in seconds (default: 0.05)
+        LOOP_LAG_THRESHOLD: lag reported as a stall, in seconds (default: 0.1)
+    """
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None):
+        self.enabled = os.getenv("LOOP_MONITOR", "true").lower() in ("1", "true", "yes")
+        self.interval = interval if interval is not None else float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.recent: Deque[float] = deque(maxlen=10_000)
+
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start monitoring the running loop (call from inside it)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.recent.clear()
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self._beat = now
+
+            LOOP_LAG_SECONDS.observe(lag)
+            self.recent.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag > self.threshold:
+                self.stalls += 1
+                LOOP_STALLS.inc()
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue > self.threshold and beat != reported_beat:
+                reported_beat = beat
+                print(f"Event loop blocked for {overdue * 1000:.0f}ms (still running):\n{self._loop_stack()}")
+
+    def _loop_stack(self, limit: int = 12) -> str:
+        frame = sys._current_frames().get(self._loop_thread)
+        lines = []
+        while frame is not None and len(lines) < limit:
+            code = frame.f_code
+            lines.append(f"  {code.co_filename}:{frame.f_lineno} in {code.co_name}")
+            frame = frame.f_back
+        return "\n".join(lines)
@@ -1,6 +1,7 @@
 import torch
 from PIL import Image
 import os
+from typing import Callable, Optional
 
 try:
     from diffusers import FluxPipeline
@@ -8,6 +9,8 @@ except ImportError:
     # Fallback for older diffusers versions
     from diffusers import DiffusionPipeline as FluxPipeline
 
+from tiled_panorama import TiledPanoramaRenderer, blend_seam
+
 
 class FluxPanoramaGenerator:
     """
@@ -20,6 +23,7 @@ class FluxPanoramaGenerator:
         self.model_id = "black-forest-labs/FLUX.1-dev"
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.loaded = False
+        self.img2img = None
 
         # Load model on initialization
         self.load_model()
@@ -82,6 +86,7 @@ class FluxPanoramaGenerator:
         height: int = 1024,
         num_inference_steps: int = 50,
         guidance_scale: float = 7.5,
+        seed: Optional[int] = None,
     ) -> Image.Image:
         """
         Generate a panoramic image.
@@ -92,6 +97,7 @@ class FluxPanoramaGenerator:
             height: Image height (default 1024 for 2:1 ratio)
             num_inference_steps: Number of denoising steps
             guidance_scale: How closely to follow the prompt
+            seed: Fixed noise seed (same seed and size, same composition); random if None
 
         Returns:
             PIL Image object
@@ -114,11 +120,13 @@ class FluxPanoramaGenerator:
                     width=width,
                     num_inference_steps=num_inference_steps,
                     guidance_scale=guidance_scale,
+                    generator=torch.Generator("cpu").manual_seed(seed) if seed is not None else None,
                 )
 
             image = result.images[0]
 
-            return image
+            # Equirectangular: the left and right edges must meet
+            return blend_seam(image, int(os.getenv("PANORAMA_SEAM_BAND", "32")))
 
         except torch.cuda.OutOfMemoryError:
             print("CUDA out of memory! Try reducing image size or enabling CPU offload.")
@@ -127,6 +135,79 @@ class FluxPanoramaGenerator:
             print(f"Error during generation: {e}")
             raise
 
+    def generate_tiled(
+        self,
+        prompt: str,
+        width: int = 4096,
+        height: int = 2048,
+        base_width: int = 2048,
+        num_inference_steps: int = 50,
+        guidance_scale: float = 7.5,
+        seed: Optional[int] = None,
+        strength: Optional[float] = None,
+        on_tile: Optional[Callable[[int, int], None]] = None,
+    ) -> Image.Image:
+        """
+        Generate a high-resolution panorama by refining a base render in tiles.
+
+        The base panorama is rendered in one pass at `base_width`, then
+        upscaled tile by tile through img2img. Tiles wrap across the
+        longitude seam, so the left and right edges are refined together
+        and always meet. Peak VRAM is that of one tile, whatever the output
+        size.
+
+        Config (env):
+            PANORAMA_TILE_SIZE: Tile edge in pixels (default: 1024)
+            PANORAMA_TILE_OVERLAP: Blend overlap in pixels (default: 128)
+            PANORAMA_TILE_STRENGTH: img2img strength per tile (default: 0.35)
+
+        Args:
+            prompt: Text description of the scene
+            width: Output width (2:1 equirectangular)
+            height: Output height
+            base_width: Width of the single-pass base render
+            num_inference_steps: Denoising steps (scaled by strength per tile)
+            guidance_scale: How closely to follow the prompt
+            seed: Fixed noise seed for the base render; random if None
+            strength: How much each tile may change (0-1)
+            on_tile: Optional callback(done, total) after each tile
+
+        Returns:
+            PIL Image object
+        """
+        base_width = min(base_width, width)
+        base = self.generate(prompt, width=base_width, height=base_width * height // width,
+                             num_inference_steps=num_inference_steps, guidance_scale=guidance_scale, seed=seed)
+
+        if strength is None:
+            strength = float(os.getenv("PANORAMA_TILE_STRENGTH", "0.35"))
+        enhanced_prompt = f"{prompt}, ultra high quality, photorealistic, fine detail"
+        pipe = self._img2img_pipe()
+
+        def refine(tile: Image.Image) -> Image.Image:
+            with torch.inference_mode():
+                result = pipe(
+                    prompt=enhanced_prompt,
+                    image=tile,
+                    height=tile.height,
+                    width=tile.width,
+                    strength=strength,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                )
+            return result.images[0]
+
+        renderer = TiledPanoramaRenderer(refine)
+        print(f"Refining {width}x{height} panorama in {len(renderer.plan(width, height))} tiles")
+        return renderer.render(base, width, height, on_tile=on_tile)
+
+    def _img2img_pipe(self):
+        """img2img pipeline sharing the loaded model's weights (created once)"""
+        if self.img2img is None:
+            from diffusers import AutoPipelineForImage2Image
+            self.img2img = AutoPipelineForImage2Image.from_pipe(self.pipe)
+        return self.img2img
+
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
         return self.loaded
@@ -134,6 +215,7 @@ class FluxPanoramaGenerator:
     def unload_model(self):
         """Unload model to free memory"""
         if self.pipe:
+            self.img2img = None
             del self.pipe
             if self.device == "cuda":
                 torch.cuda.empty_cache()
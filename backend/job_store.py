@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+from fast_json import dumps, loads
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+FINISHED = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+class Job:
+    """
+    One generation job.
+
+    Uses __slots__ rather than a dict per job; `result` references the
+    record that was written to the metadata store instead of copying it.
+    """
+
+    __slots__ = (
+        "job_id", "kind", "status", "created_at", "scenario", "completed_at",
+        "result", "error", "timings", "profile_id", "estimated_wait", "preview",
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        kind: str,
+        scenario: str,
+        created_at: Optional[str] = None,
+        status: JobStatus = JobStatus.PENDING,
+        completed_at: Optional[str] = None,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        profile_id: Optional[str] = None,
+        estimated_wait: Optional[float] = None,
+        preview: Optional[dict] = None,
+    ):
+        self.job_id = job_id
+        self.kind = kind
+        self.status = JobStatus(status)
+        self.created_at = created_at or datetime.utcnow().isoformat()
+        self.scenario = scenario
+        self.completed_at = completed_at
+        self.result = result
+        self.error = error
+        self.timings = timings
+        self.profile_id = profile_id
+        self.estimated_wait = estimated_wait
+        # Early low-step render, published while the full one runs
+        self.preview = preview
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        return cls(**{name: data.get(name) for name in cls.__slots__ if name in data})
+
+
+class JobStore:
+    """
+    Bounded in-memory job table backed by SQLite.
+
+    Unfinished jobs always stay in memory (their count is capped by
+    admission control). Finished jobs are written to SQLite as they finish,
+    and only the most recent `max_finished` of them are kept in memory;
+    older ones are loaded back from disk on lookup.
+
+    Config (env):
+        JOB_HISTORY_SIZE: finished jobs kept in memory (default: 1000)
+        JOBS_DB: SQLite path (default: <IMAGES_DIR>/.jobs.db)
+    """
+
+    def __init__(self, db_path: str, max_finished: Optional[int] = None):
+        if max_finished is None:
+            max_finished = int(os.getenv("JOB_HISTORY_SIZE", "1000"))
+        self.max_finished = max_finished
+        self.db_path = db_path
+
+        self._active: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()  # oldest first
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs "
+            "(job_id TEXT PRIMARY KEY, completed_at TEXT, data TEXT NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            # WAL + NORMAL: durable across process crashes, one fsync per checkpoint
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def create(self, kind: str, scenario: str, estimated_wait: Optional[float] = None) -> Job:
+        job = Job(str(uuid.uuid4()), kind, scenario, estimated_wait=estimated_wait)
+        with self._lock:
+            self._active[job.job_id] = job
+        return job
+
+    def start(self, job: Job):
+        job.status = JobStatus.PROCESSING
+
+    def finish(self, job: Job, status: JobStatus, result: Optional[dict] = None, error: Optional[str] = None):
+        """Mark a job completed/failed, persist it and trim the in-memory history"""
+        job.result = result
+        job.error = error
+        job.completed_at = datetime.utcnow().isoformat()
+        job.status = status
+
+        try:
+            self._persist(job)
+        except sqlite3.Error as e:
+            print(f"Could not persist job {job.job_id}: {e}")
+
+        with self._lock:
+            self._active.pop(job.job_id, None)
+            self._finished[job.job_id] = job
+            while len(self._finished) > self.max_finished:
+                self._finished.popitem(last=False)
+
+    def _persist(self, job: Job):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, completed_at, data) VALUES (?, ?, ?)",
+            (job.job_id, job.completed_at, dumps(job.to_dict()).decode("utf-8")),
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get_cached(self, job_id: str) -> Optional[Job]:
+        """In-memory lookup only (never blocks on disk)"""
+        with self._lock:
+            return self._active.get(job_id) or self._finished.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job, falling back to SQLite for evicted ones (blocking)"""
+        job = self.get_cached(job_id)
+        if job is not None:
+            return job
+
+        row = self._connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return Job.from_dict(loads(row[0])) if row else None
+
+    def unfinished(self) -> List[Job]:
+        """Pending and processing jobs, oldest first"""
+        with self._lock:
+            return list(self._active.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._active) + len(self._finished)
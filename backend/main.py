@@ -1,26 +1,62 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import APIRouter, FastAPI, HTTPException, BackgroundTasks, Header, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Union
+from contextlib import asynccontextmanager
 import uvicorn
+import io
+import random
+import secrets
 import os
+import time
 from datetime import datetime
-import json
-import uuid
-from enum import Enum
 
 from image_generator import FluxPanoramaGenerator
 from prompt_generator import PromptGenerator
 from storage import ImageStorage
 from world_generator import HunyuanWorldGenerator
+from metadata_store import MetadataStore, new_image_id
+from world_store import WorldStore
+from artifacts import WORLD_CACHE_CONTROL
+from scenario_catalog import get_catalog
+from metrics import REGISTRY, JOBS_TOTAL, TIME_TO_IMAGE_SECONDS, StageTimer
+from profiling import Profiler, ProfilingMiddleware
+from static_files import ArtifactFiles, precompress
+from retention import RetentionManager
+from admission import AdmissionController
+from quality import QualityGate
+from concurrency import LoopLagMonitor, run_io
+from job_store import Job, JobStatus, JobStore
 
-app = FastAPI(title="Island Survival API")
+# Reports event-loop stalls (any blocking call in an async handler) with a stack
+loop_monitor = LoopLagMonitor()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    yield
+    loop_monitor.stop()
+
+
+app = FastAPI(title="Island Survival API", lifespan=lifespan)
+
+IMAGES_DIR = os.getenv("IMAGES_DIR", "/app/generated_images")
+WORLDS_DIR = os.getenv("WORLDS_DIR", "/app/generated_worlds")
+
+# Panoramas wider than the single-pass render are upscaled in tiles
+NATIVE_WIDTH = 2048
+PANORAMA_MAX_WIDTH = int(os.getenv("PANORAMA_MAX_WIDTH", "8192"))
+MAX_STEPS = 100
+
+# Fast-preview tier defaults (GenerateRequest.preview)
+PREVIEW_STEPS = int(os.getenv("PREVIEW_STEPS", "8"))
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", "1024"))
 
 # Create images directory if it doesn't exist
-os.makedirs("/app/generated_images", exist_ok=True)
-os.makedirs("/app/generated_worlds", exist_ok=True)
+os.makedirs(IMAGES_DIR, exist_ok=True)
+os.makedirs(WORLDS_DIR, exist_ok=True)
 
 # CORS middleware
 app.add_middleware(
@@ -31,31 +67,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for serving images and 3D worlds
-app.mount("/images", StaticFiles(directory="/app/generated_images"), name="images")
-app.mount("/worlds", StaticFiles(directory="/app/generated_worlds"), name="worlds")
+# Opt-in request/job profiling (PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_MODE).
+# Profiles are only reachable through the admin endpoints, so profiling
+# stays off unless ADMIN_TOKEN protects them.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+profiler = Profiler()
+if profiler.enabled and not ADMIN_TOKEN:
+    print("⚠️  PROFILING_ENABLED is set but ADMIN_TOKEN is not; profiling and admin endpoints are disabled")
+    profiler.enabled = False
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
 
 # Initialize components
 generator = FluxPanoramaGenerator()
-prompt_gen = PromptGenerator()
-storage = ImageStorage()
-world_gen = HunyuanWorldGenerator()
+storage = ImageStorage(IMAGES_DIR, WORLDS_DIR)
+
+# Scenario catalog is hot-reloaded in place; the loaded Flux model is untouched
+catalog = get_catalog()
+catalog.start_watching()
+prompt_gen = PromptGenerator(catalog)
+world_gen = HunyuanWorldGenerator(catalog)
+
+# Image metadata index (snapshot + append-only journal, replayed on startup)
+metadata = MetadataStore(IMAGES_DIR)
+# Worlds index (same format, in WORLDS_DIR); built from the world_* dirs on first start
+worlds = WorldStore(WORLDS_DIR)
+if not worlds.exists():
+    worlds.rebuild(
+        world_gen.find_glb,
+        storage.get_world_url,
+        lambda image_id: (metadata.get(image_id) or {}).get("scenario", ""),
+    )
+# Bounded in-memory job table; finished jobs are persisted and stay retrievable
+jobs = JobStore(os.getenv("JOBS_DB", os.path.join(IMAGES_DIR, ".jobs.db")))
+
+# Disk quota / retention with LRU eviction (RETENTION_MAX_BYTES, RETENTION_MAX_AGE_DAYS, ...)
+retention = RetentionManager(storage, metadata, worlds)
+if retention.enabled:
+    retention.start()
 
-# Job status enum
-class JobStatus(str, Enum):
-    PENDING = "pending"
-    PROCESSING = "processing"
-    COMPLETED = "completed"
-    FAILED = "failed"
+# Per-client rate limits, queue cap and wait estimates for generation endpoints
+admission = AdmissionController()
 
-# In-memory storage
-generated_images = []
-jobs = {}  # job_id -> job info
+# Seam/pole/variance check with seed retry (QUALITY_CHECK, QUALITY_MAX_SEAM, ...)
+quality_gate = QualityGate()
+
+# Mount static files for serving images and 3D worlds
+# (content-hash ETags, Range requests, precompressed siblings). Images are
+# cached as immutable; worlds are regenerated in place, so they revalidate.
+app.mount("/images", ArtifactFiles(directory=IMAGES_DIR, on_access=retention.touch_path), name="images")
+app.mount("/worlds", ArtifactFiles(directory=WORLDS_DIR, on_access=retention.touch_path,
+                                   cache_control=WORLD_CACHE_CONTROL), name="worlds")
 
 
 class GenerateRequest(BaseModel):
     scenario: str = "random"
     custom_prompt: Optional[str] = None
+    # Output width (height is width / 2); above 2048 the panorama is tiled
+    width: Optional[int] = None
+    steps: Optional[int] = None  # denoising steps for the final image (default 50)
+    # Two-tier mode: a quick low-res render is published on the job first
+    preview: bool = False
+    preview_steps: Optional[int] = None  # default PREVIEW_STEPS
+    preview_width: Optional[int] = None  # default PREVIEW_WIDTH
 
 
 class ImageResponse(BaseModel):
@@ -69,6 +143,7 @@ class ImageResponse(BaseModel):
 class Generate3DRequest(BaseModel):
     image_id: str
     classes: Optional[str] = None  # outdoor, indoor, etc.
+    force: bool = False  # run even if the panorama failed the quality check
 
 
 class World3DResponse(BaseModel):
@@ -77,6 +152,23 @@ class World3DResponse(BaseModel):
     world_url: str  # URL to .glb file
     created_at: str
     scenario: str
+    size_bytes: Optional[int] = None  # .glb size
+    generation_time: Optional[float] = None  # seconds; None for worlds indexed from disk
+
+
+class WorldListResponse(BaseModel):
+    worlds: List[World3DResponse]
+    total: int  # matching worlds across all pages
+    offset: int
+    limit: int
+
+
+class PreviewResponse(BaseModel):
+    image_url: Optional[str] = None  # cleared once the final image replaces it
+    width: int
+    height: int
+    steps: int
+    ready_after: float  # seconds from job start until the preview was viewable
 
 
 class JobResponse(BaseModel):
@@ -84,8 +176,12 @@ class JobResponse(BaseModel):
     status: JobStatus
     created_at: str
     completed_at: Optional[str] = None
-    result: Optional[ImageResponse] = None
+    result: Optional[Union[ImageResponse, World3DResponse]] = None
     error: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # seconds per pipeline stage
+    profile_id: Optional[str] = None  # set when the job was profiled
+    estimated_wait: Optional[float] = None  # seconds until the job is expected to start
+    preview: Optional[PreviewResponse] = None  # early low-step render (preview mode)
 
 
 @app.get("/")
@@ -106,32 +202,126 @@ async def health():
     }
 
 
-def process_generation(job_id: str, scenario: str, custom_prompt: Optional[str] = None):
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics"""
+    # Collectors take locks and may query CUDA
+    return PlainTextResponse(await run_io(REGISTRY.render), media_type="text/plain; version=0.0.4")
+
+
+def queued_kinds() -> List[str]:
+    """Kinds of unfinished jobs, oldest first"""
+    return [job.kind for job in jobs.unfinished()]
+
+
+def queue_depth():
+    """Jobs waiting or running, by status"""
+    counts = {(JobStatus.PENDING.value,): 0, (JobStatus.PROCESSING.value,): 0}
+    for job in jobs.unfinished():
+        counts[(job.status.value,)] += 1
+    return counts
+
+
+REGISTRY.gauge("island_queue_depth", "Generation jobs not yet finished", ["status"], collect=queue_depth)
+REGISTRY.gauge("island_local_artifact_bytes", "Local disk used by artifacts", ["kind"], collect=retention.stats)
+
+
+def process_generation(job: Job, request: GenerateRequest):
     """Background task to generate image"""
+    with profiler.profile_job(job.job_id, job):
+        _process_generation(job, request)
+
+
+def _render(prompt: str, width: Optional[int], **kwargs):
+    """Single pass up to NATIVE_WIDTH, tiled upscale above it"""
+    if width is None:
+        return generator.generate(prompt, **kwargs)
+    if width > NATIVE_WIDTH:
+        return generator.generate_tiled(prompt, width=width, height=width // 2, base_width=NATIVE_WIDTH, **kwargs)
+    return generator.generate(prompt, width=width, height=width // 2, **kwargs)
+
+
+def _publish_preview(job: Job, image_id: str, prompt: str, request: GenerateRequest,
+                     timer: StageTimer, started: float, seed: int):
+    """Render the low-step tier and attach it to the job before the full render"""
+    width = request.preview_width or PREVIEW_WIDTH
+    steps = request.preview_steps or PREVIEW_STEPS
+
+    with timer.span("preview"):
+        image = generator.generate(prompt, width=width, height=width // 2, num_inference_steps=steps, seed=seed)
+
+    with timer.span("preview_save"):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        url = storage.save_preview(image_id, buffer.getvalue())
+
+    ready_after = time.perf_counter() - started
+    job.preview = {"image_url": url, "width": width, "height": width // 2, "steps": steps,
+                   "ready_after": round(ready_after, 3)}
+    TIME_TO_IMAGE_SECONDS.observe(ready_after, tier="preview")
+    print(f"[Job {job.job_id}] Preview ready after {ready_after:.2f}s ({steps} steps, {width}px)")
+
+
+def _retire_preview(job: Job, image_id: str):
+    """Delete the preview file; the job keeps its tier stats without the URL"""
+    if job.preview and job.preview["image_url"]:
+        storage.delete_preview(image_id)
+        job.preview = {**job.preview, "image_url": None}
+
+
+def _process_generation(job: Job, request: GenerateRequest):
+    job_id = job.job_id
+    scenario = request.scenario
+    timer = StageTimer("image")
+    job.timings = timer.timings
+    started = time.perf_counter()
+    image_id = new_image_id()
+
     try:
         # Update status to processing
-        jobs[job_id]["status"] = JobStatus.PROCESSING
+        jobs.start(job)
 
         # Generate or use custom prompt
-        if custom_prompt:
-            prompt = custom_prompt
-        else:
-            prompt = prompt_gen.generate(scenario)
+        with timer.span("prompt"):
+            if request.custom_prompt:
+                prompt = request.custom_prompt
+            else:
+                prompt = prompt_gen.generate(scenario)
 
         print(f"[Job {job_id}] Generating image with prompt: {prompt}")
 
-        # Generate image
-        image = generator.generate(prompt)
+        render_args = {}
+        if request.steps:
+            render_args["num_inference_steps"] = request.steps
+
+        # The preview only approximates the final image: at another resolution
+        # the same seed draws different latent noise, and the quality check
+        # may re-roll the final seed
+        seed = random.getrandbits(32)
+        if request.preview:
+            _publish_preview(job, image_id, prompt, request, timer, started, seed)
+
+        # Generate image; re-rolled with a new seed if it fails the quality check,
+        # before anything is encoded or uploaded
+        image, quality = quality_gate.generate(
+            lambda s: _render(prompt, request.width, seed=s, **render_args),
+            seed, timer=timer, label=f"[Job {job_id}]",
+        )
 
         # Save and upload image
-        image_id = f"{int(datetime.utcnow().timestamp())}"
-        local_path = f"/app/generated_images/{image_id}.png"
+        with timer.span("encode"):
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
 
-        os.makedirs("/app/generated_images", exist_ok=True)
-        image.save(local_path)
+        with timer.span("save"):
+            # Make room first, so a full volume doesn't fail the write
+            retention.ensure_space(buffer.getbuffer().nbytes)
+            local_path = storage.save_image(image_id, buffer.getvalue())
+            retention.track_image(image_id, scenario)
 
         # Upload to S3 (or use local URL for development)
-        image_url = storage.upload(local_path, image_id)
+        with timer.span("upload"):
+            image_url = storage.upload(local_path, image_id)
 
         # Create response
         image_data = ImageResponse(
@@ -142,143 +332,177 @@ def process_generation(job_id: str, scenario: str, custom_prompt: Optional[str]
             scenario=scenario
         )
 
-        # Store in memory
-        generated_images.insert(0, image_data.dict())
+        # Append to metadata journal (quality scores are kept with the record)
+        record = image_data.dict()
+        record["quality"] = quality
+        with timer.span("metadata_commit"):
+            metadata.add(record)
 
-        # Save to JSON file as backup
-        with open("/app/generated_images/metadata.json", "w") as f:
-            json.dump(generated_images, f, indent=2)
+        TIME_TO_IMAGE_SECONDS.observe(time.perf_counter() - started, tier="final")
+        # Superseded by the final image
+        _retire_preview(job, image_id)
 
-        # Update job status
-        jobs[job_id]["status"] = JobStatus.COMPLETED
-        jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
-        jobs[job_id]["result"] = image_data.dict()
+        # Update job status (shares the record instead of copying it)
+        jobs.finish(job, JobStatus.COMPLETED, result=record)
+        JOBS_TOTAL.inc(kind="image", outcome="completed")
+        admission.record_duration("image", timer.total)
 
-        print(f"[Job {job_id}] Completed successfully")
+        print(f"[Job {job_id}] Completed successfully in {timer.total:.2f}s")
 
     except Exception as e:
         print(f"[Job {job_id}] Error: {e}")
-        jobs[job_id]["status"] = JobStatus.FAILED
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
+        JOBS_TOTAL.inc(kind="image", outcome="failed")
+        _retire_preview(job, image_id)
+        jobs.finish(job, JobStatus.FAILED, error=str(e))
+
+
+def _validate_generate(request: GenerateRequest):
+    """400 for sizes and step counts the pipeline can't render"""
+    sizes = (("width", request.width, 512, PANORAMA_MAX_WIDTH),
+             ("preview_width", request.preview_width, 256, NATIVE_WIDTH))
+    for name, value, low, high in sizes:
+        if value is not None and (value % 64 or not low <= value <= high):
+            raise HTTPException(status_code=400, detail=f"{name} must be a multiple of 64 between {low} and {high}")
+
+    for name, value in (("steps", request.steps), ("preview_steps", request.preview_steps)):
+        if value is not None and not 1 <= value <= MAX_STEPS:
+            raise HTTPException(status_code=400, detail=f"{name} must be between 1 and {MAX_STEPS}")
 
 
 @app.post("/api/generate", response_model=JobResponse)
-async def generate_image(request: GenerateRequest, background_tasks: BackgroundTasks):
+async def generate_image(
+    request: GenerateRequest,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    x_profile: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None)
+):
     """Start async image generation and return job ID"""
 
-    # Create job
-    job_id = str(uuid.uuid4())
-
-    jobs[job_id] = {
-        "job_id": job_id,
-        "status": JobStatus.PENDING,
-        "created_at": datetime.utcnow().isoformat(),
-        "scenario": request.scenario,
-        "completed_at": None,
-        "result": None,
-        "error": None
-    }
+    _validate_generate(request)
+
+    # Creates the job, or 429 with Retry-After if the client is over its rate or the queue is full
+    client = admission.client_key(http_request, x_api_key)
+    job = await run_io(
+        admission.admit, "generate", "image", client, queued_kinds,
+        lambda estimated_wait: jobs.create("image", request.scenario, estimated_wait),
+    )
+
+    # "X-Profile: cprofile|sampler|1" profiles this job when profiling is enabled
+    if x_profile and profiler.enabled:
+        profiler.arm_job(job.job_id, x_profile if x_profile in ("cprofile", "sampler") else None)
 
     # Start background task
     background_tasks.add_task(
         process_generation,
-        job_id,
-        request.scenario,
-        request.custom_prompt
+        job,
+        request
     )
 
-    return JobResponse(**jobs[job_id])
+    return JobResponse(**job.to_dict())
 
 
 @app.get("/api/jobs/{job_id}", response_model=JobResponse)
 async def get_job_status(job_id: str):
     """Get status of a generation job"""
 
-    if job_id not in jobs:
+    # Older finished jobs have been evicted to SQLite
+    job = jobs.get_cached(job_id) or await run_io(jobs.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return JobResponse(**jobs[job_id])
+    data = job.to_dict()
+    result = data["result"]
+    if result and "image_url" in result and storage.urls_expire:
+        # Presigned URLs in finished jobs may have expired since
+        data["result"] = await run_io(storage.resolve_image, result)
+
+    return JobResponse(**data)
 
 
 @app.get("/api/images", response_model=List[ImageResponse])
 async def get_images():
     """Get all generated images"""
 
-    # Load from JSON file
-    try:
-        if os.path.exists("/app/generated_images/metadata.json"):
-            with open("/app/generated_images/metadata.json", "r") as f:
-                data = json.load(f)
-                return data
-    except Exception as e:
-        print(f"Error loading images: {e}")
+    # Records are already in ImageResponse shape; skip per-item validation
+    return Response(await run_io(_list_images_body), media_type="application/json")
+
 
-    return generated_images
+def _list_images_body() -> bytes:
+    if not storage.urls_expire:
+        # Encoded once per metadata change
+        return metadata.encoded_responses()
+    # Presigned URLs expire: re-signed and re-encoded once per change or
+    # once per list_ttl, whichever comes first
+    return metadata.encoded_responses(storage.resolve_images, storage.list_ttl)
 
 
 @app.get("/api/images/{image_id}", response_model=ImageResponse)
 async def get_image(image_id: str):
     """Get a specific image by ID"""
 
-    # First, try to find in memory
-    for img in generated_images:
-        if img["id"] == image_id:
-            return img
-
-    # If not in memory, load from JSON file
-    try:
-        if os.path.exists("/app/generated_images/metadata.json"):
-            with open("/app/generated_images/metadata.json", "r") as f:
-                all_images = json.load(f)
-                for img in all_images:
-                    if img["id"] == image_id:
-                        return img
-    except Exception as e:
-        print(f"Error loading image metadata: {e}")
+    img = await run_io(_get_image, image_id)
+    if img:
+        retention.touch("image", image_id)
+        return img
 
     raise HTTPException(status_code=404, detail="Image not found")
 
 
+def _get_image(image_id: str) -> Optional[dict]:
+    img = metadata.get(image_id)
+    return storage.resolve_image(img) if img else None
+
+
 @app.delete("/api/images/{image_id}")
 async def delete_image(image_id: str):
     """Delete an image"""
 
-    global generated_images
+    if await run_io(_delete_image, image_id):
+        return {"message": "Image deleted"}
 
-    for i, img in enumerate(generated_images):
-        if img["id"] == image_id:
-            # Delete from storage
-            storage.delete(image_id)
+    raise HTTPException(status_code=404, detail="Image not found")
 
-            # Remove from memory
-            generated_images.pop(i)
 
-            # Update JSON
-            with open("/app/generated_images/metadata.json", "w") as f:
-                json.dump(generated_images, f, indent=2)
+def _delete_image(image_id: str) -> bool:
+    """Blocking part of delete_image (S3, disk, journal); False if unknown"""
 
-            return {"message": "Image deleted"}
+    if image_id not in metadata:
+        return False
 
-    raise HTTPException(status_code=404, detail="Image not found")
+    # Storage, metadata journal, and the world generated from it (files and
+    # index record); the same cascade retention uses for local-only images
+    retention.delete_image(image_id)
+    return True
 
 
 # ============================================================================
 # 3D World Generation Endpoints
 # ============================================================================
 
-def process_3d_generation(job_id: str, image_id: str, scenario: str, classes: Optional[str] = None):
+def process_3d_generation(job: Job, image_id: str, scenario: str, classes: Optional[str] = None):
     """Background task to generate 3D world from panorama"""
+    with profiler.profile_job(job.job_id, job):
+        _process_3d_generation(job, image_id, scenario, classes)
+
+
+def _process_3d_generation(job: Job, image_id: str, scenario: str, classes: Optional[str] = None):
+    job_id = job.job_id
+    timer = StageTimer("world")
+    job.timings = timer.timings
+
     try:
-        jobs[job_id]["status"] = JobStatus.PROCESSING
+        jobs.start(job)
 
         if not world_gen.is_available():
             raise Exception("HunyuanWorld is not installed. Run install_hunyuan.sh first.")
 
         # Find the panorama image
-        panorama_path = f"/app/generated_images/{image_id}.png"
+        # Panorama may only be in S3 if retention evicted the local copy
+        panorama_path = storage.ensure_local_image(image_id)
         if not os.path.exists(panorama_path):
             raise Exception(f"Panorama image not found: {image_id}")
+        retention.track_image(image_id, scenario)
 
         # Determine scene class
         if not classes:
@@ -292,20 +516,25 @@ def process_3d_generation(job_id: str, image_id: str, scenario: str, classes: Op
 
         # Generate 3D world
         world_id = f"world_{image_id}"
-        output_dir = f"/app/generated_worlds/{world_id}"
+        output_dir = f"{WORLDS_DIR}/{world_id}"
 
         glb_path = world_gen.generate_3d_world(
             panorama_path=panorama_path,
             output_path=output_dir,
             classes=classes,
             labels_fg1=fg1,
-            labels_fg2=fg2
+            labels_fg2=fg2,
+            timer=timer
         )
 
-        # Get public URL for the .glb file
-        public_url = os.getenv("PUBLIC_URL", os.getenv("LOCAL_BASE_URL", "http://localhost:8000"))
-        glb_filename = os.path.basename(glb_path)
-        world_url = f"{public_url}/worlds/{world_id}/{glb_filename}"
+        # Precompressed .gz/.br siblings for clients that accept them
+        with timer.span("precompress"):
+            precompress(glb_path)
+        retention.track_world(world_id)
+
+        # Upload to S3 so downloads bypass this box (or use local URL)
+        with timer.span("upload"):
+            world_url = storage.upload_world(glb_path, world_id)
 
         # Create response
         world_data = World3DResponse(
@@ -313,74 +542,173 @@ def process_3d_generation(job_id: str, image_id: str, scenario: str, classes: Op
             image_id=image_id,
             world_url=world_url,
             created_at=datetime.utcnow().isoformat(),
-            scenario=scenario
+            scenario=scenario,
+            size_bytes=os.path.getsize(glb_path),
+            generation_time=timer.total
         )
 
-        jobs[job_id]["status"] = JobStatus.COMPLETED
-        jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
-        jobs[job_id]["result"] = world_data.dict()
+        # Persist beyond the job (listed by /api/worlds)
+        with timer.span("index"):
+            worlds.add(world_data.dict())
+
+        jobs.finish(job, JobStatus.COMPLETED, result=world_data.dict())
+        JOBS_TOTAL.inc(kind="world", outcome="completed")
+        admission.record_duration("world", timer.total)
 
         print(f"[Job {job_id}] 3D world generated successfully: {world_url}")
 
     except Exception as e:
         print(f"[Job {job_id}] 3D generation error: {e}")
-        jobs[job_id]["status"] = JobStatus.FAILED
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
+        JOBS_TOTAL.inc(kind="world", outcome="failed")
+        jobs.finish(job, JobStatus.FAILED, error=str(e))
 
 
 @app.post("/api/generate-3d", response_model=JobResponse)
-async def generate_3d_world(request: Generate3DRequest, background_tasks: BackgroundTasks):
+async def generate_3d_world(
+    request: Generate3DRequest,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    x_profile: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None)
+):
     """Generate 3D world from existing panorama image"""
 
     # Find the image to get scenario info
-    image_data = None
-
-    # First, try to find in memory
-    for img in generated_images:
-        if img["id"] == request.image_id:
-            image_data = img
-            break
-
-    # If not in memory, load from JSON file
-    if not image_data:
-        try:
-            if os.path.exists("/app/generated_images/metadata.json"):
-                with open("/app/generated_images/metadata.json", "r") as f:
-                    all_images = json.load(f)
-                    for img in all_images:
-                        if img["id"] == request.image_id:
-                            image_data = img
-                            break
-        except Exception as e:
-            print(f"Error loading image metadata: {e}")
+    image_data = await run_io(metadata.get, request.image_id)
 
     if not image_data:
         raise HTTPException(status_code=404, detail=f"Image {request.image_id} not found")
 
-    # Create job
-    job_id = str(uuid.uuid4())
-
-    jobs[job_id] = {
-        "job_id": job_id,
-        "status": JobStatus.PENDING,
-        "created_at": datetime.utcnow().isoformat(),
-        "scenario": image_data["scenario"],
-        "completed_at": None,
-        "result": None,
-        "error": None
-    }
+    # Don't spend a 10-minute HunyuanWorld run on a panorama that failed its check
+    quality = image_data.get("quality")
+    if quality and not quality.get("passed", True) and not request.force:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Image {request.image_id} failed the panorama quality check; send force=true to use it anyway",
+        )
+
+    client = admission.client_key(http_request, x_api_key)
+    job = await run_io(
+        admission.admit, "generate-3d", "world", client, queued_kinds,
+        lambda estimated_wait: jobs.create("world", image_data["scenario"], estimated_wait),
+    )
+
+    # "X-Profile: cprofile|sampler|1" profiles this job when profiling is enabled
+    if x_profile and profiler.enabled:
+        profiler.arm_job(job.job_id, x_profile if x_profile in ("cprofile", "sampler") else None)
 
     # Start background task
     background_tasks.add_task(
         process_3d_generation,
-        job_id,
+        job,
         request.image_id,
         image_data["scenario"],
         request.classes
     )
 
-    return JobResponse(**jobs[job_id])
+    return JobResponse(**job.to_dict())
+
+
+@app.get("/api/worlds", response_model=WorldListResponse)
+async def list_worlds(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    scenario: Optional[str] = None
+):
+    """List generated 3D worlds, newest first"""
+
+    total, page = await run_io(worlds.page, offset, limit, scenario)
+    if storage.urls_expire:
+        page = await run_io(lambda: [storage.resolve_world(world) for world in page])
+    return WorldListResponse(worlds=page, total=total, offset=offset, limit=limit)
+
+
+@app.get("/api/worlds/{world_id}", response_model=World3DResponse)
+async def get_world(world_id: str):
+    """Get a specific 3D world by ID"""
+
+    world = await run_io(worlds.get, world_id)
+    if not world:
+        raise HTTPException(status_code=404, detail="World not found")
+    return await run_io(storage.resolve_world, world)
+
+
+@app.get("/api/images/{image_id}/world", response_model=World3DResponse)
+async def get_image_world(image_id: str):
+    """Get the 3D world generated from an image"""
+
+    world = await run_io(worlds.get_by_image, image_id)
+    if not world:
+        raise HTTPException(status_code=404, detail=f"No 3D world for image {image_id}")
+    return await run_io(storage.resolve_world, world)
+
+
+# ============================================================================
+# Admin: Profiling
+# ============================================================================
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need X-Admin-Token to match ADMIN_TOKEN"""
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+# Only mounted when profiling is enabled (which requires ADMIN_TOKEN)
+admin = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+
+@admin.get("/profiles")
+async def list_profiles():
+    """List captured profiles, newest first"""
+    return profiler.list()
+
+
+@admin.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: Optional[str] = None):
+    """Download a profile as pstats (binary), text, or collapsed stacks"""
+
+    record = profiler.get(profile_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    format = format or record.formats()[0]
+    if format not in record.formats():
+        raise HTTPException(
+            status_code=400,
+            detail=f"{record.mode} profiles support: {', '.join(record.formats())}"
+        )
+
+    if format == "pstats":
+        return Response(
+            record.pstats_data,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'}
+        )
+    if format == "text":
+        return PlainTextResponse(await run_io(record.text))
+    return PlainTextResponse(record.collapsed)
+
+
+@admin.post("/profiles/jobs/{job_id}")
+async def profile_job(job_id: str, mode: Optional[str] = None):
+    """Arm profiling for a job that has not started yet"""
+
+    job = jobs.get_cached(job_id) or await run_io(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JobStatus.PENDING:
+        raise HTTPException(status_code=409, detail="Job already started")
+
+    try:
+        profiler.arm_job(job_id, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"message": "Job armed for profiling", "job_id": job_id}
+
+
+if profiler.enabled:
+    app.include_router(admin)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,471 @@
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+from fast_json import dumps, loads
+
+
+def new_image_id() -> str:
+    """
+    Unique image id, prefixed with the creation timestamp.
+
+    Plain second timestamps collide when several jobs finish in the same
+    second, silently overwriting each other's PNG and metadata.
+    """
+    return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+class ImageRecord:
+    """
+    Compact in-memory form of one image's metadata.
+
+    A __slots__ object instead of a per-record dict, with the handful of
+    scenario names interned. Keys beyond the core fields (generation_time,
+    timings, ...) are kept in `extra`, which is None for most records.
+    """
+
+    __slots__ = ("id", "prompt", "image_url", "created_at", "scenario", "extra")
+
+    FIELDS = ("id", "prompt", "image_url", "created_at", "scenario")
+    # Keys that mark a JSON object as a record (nested objects lack them)
+    REQUIRED = ("id", "image_url")
+
+    def __init__(self, id: str, prompt: Optional[str], image_url: Optional[str],
+                 created_at: Optional[str], scenario: Optional[str], extra: Optional[dict] = None):
+        self.id = id
+        self.prompt = prompt
+        self.image_url = image_url
+        self.created_at = created_at
+        self.scenario = sys.intern(scenario) if scenario else scenario
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ImageRecord":
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS}
+        return cls(data["id"], data.get("prompt"), data.get("image_url"),
+                   data.get("created_at"), data.get("scenario"), extra)
+
+    def to_dict(self) -> dict:
+        data = {name: getattr(self, name) for name in self.FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_response(self) -> dict:
+        """Only the ImageResponse fields (what the API returns)"""
+        return {
+            "id": self.id,
+            "prompt": self.prompt,
+            "image_url": self.image_url,
+            "created_at": self.created_at,
+            "scenario": self.scenario,
+        }
+
+
+class MetadataStore:
+    """
+    Append-only metadata index for generated images.
+
+    Changes are written as one JSON line per insert/delete to a journal file,
+    so the hot path never rewrites the whole index. On startup the snapshot
+    (metadata.json) is loaded and the journal replayed on top of it. Once the
+    journal passes a size threshold it is folded into a fresh snapshot by a
+    background compaction thread.
+
+    Several processes (the API and auto_generate.py) may share one directory:
+    appends and compaction are serialized with an flock on a lock file, and
+    readers pick up other writers' events by tailing the journal.
+
+    Subclasses can index other record types by overriding `record_type`
+    (see world_store.WorldStore).
+    """
+
+    record_type = ImageRecord
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_name: str = "metadata.json",
+        compact_threshold: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, snapshot_name)
+        base = os.path.splitext(snapshot_name)[0]
+        self.journal_path = os.path.join(directory, f"{base}.journal.jsonl")
+        self.rotated_path = f"{self.journal_path}.1"
+        self.lock_path = os.path.join(directory, f".{base.lstrip('.')}.lock")
+
+        if compact_threshold is None:
+            compact_threshold = int(os.getenv("METADATA_COMPACT_BYTES", 4 * 1024 * 1024))
+        self.compact_threshold = compact_threshold
+
+        # id -> record, oldest first (API order is newest first)
+        self._records: Dict[str, ImageRecord] = {}
+        # Bumped on every change; keys the encoded response cache
+        self._version = 0
+        self._encoded: Optional[bytes] = None
+        self._encoded_version = -1
+        # Same, for the list passed through encoded_responses(resolve=...)
+        self._resolved: Optional[bytes] = None
+        self._resolved_version = -1
+        self._resolved_until = 0.0
+        self._resolve_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._journal_ino = None
+        self._journal_offset = 0
+        # Identity of the snapshot we loaded (see refresh())
+        self._snapshot_id = None
+        self._compacting = False
+        # Per-thread flock depth, so nested _file_lock() calls reuse the
+        # outer lock instead of deadlocking on a second descriptor
+        self._file_lock_held = threading.local()
+
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    # ------------------------------------------------------------------
+    # Loading / replay
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Load the snapshot and replay any journal files on top of it"""
+        # The shared flock keeps a compaction in another process from
+        # swapping the snapshot and removing the rotated journal between
+        # our reads, which would silently drop the rotated events
+        with self._lock, self._file_lock(shared=True):
+            self._records = {}
+            self._version += 1
+            self._journal_ino = None
+            self._journal_offset = 0
+            self._snapshot_id = self._stat_snapshot()
+
+            if os.path.exists(self.snapshot_path):
+                try:
+                    # Build records while parsing, so the whole snapshot
+                    # never exists as dicts at once
+                    with open(self.snapshot_path, "r") as f:
+                        snapshot = json.load(f, object_hook=self._record_hook)
+                    # Snapshot is stored newest first
+                    for record in reversed(snapshot):
+                        self._records[record.id] = record
+                except (OSError, ValueError) as e:
+                    print(f"Error loading metadata snapshot: {e}")
+
+            # A rotated journal only exists if a compaction was interrupted
+            if os.path.exists(self.rotated_path):
+                with open(self.rotated_path, "rb") as f:
+                    self._apply_lines(f.read())
+
+            self._tail_journal()
+
+    def refresh(self):
+        """Pick up events appended by other processes since the last read"""
+        with self._lock:
+            # Every compaction replaces the snapshot before it frees the old
+            # journal's inode, so a new snapshot is the only reliable sign
+            # that a journal with our inode number may be a different file
+            snapshot_id = self._stat_snapshot()
+            if snapshot_id != self._snapshot_id:
+                if not self._compacting:
+                    self.load()
+                return
+
+            try:
+                st = os.stat(self.journal_path)
+                ino, size = st.st_ino, st.st_size
+            except FileNotFoundError:
+                ino, size = None, 0
+
+            if ino != self._journal_ino or size < self._journal_offset:
+                # Journal was rotated by a compaction elsewhere
+                if not self._compacting:
+                    self.load()
+            elif size > self._journal_offset:
+                self._tail_journal()
+                # Compacted (and maybe re-created) while we were reading
+                if self._stat_snapshot() != snapshot_id and not self._compacting:
+                    self.load()
+
+    def _stat_snapshot(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _tail_journal(self):
+        try:
+            with open(self.journal_path, "rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                # A different file than last time: rotated between
+                # refresh()'s stat and this open, so our offset is stale
+                rotated = self._journal_ino is not None and ino != self._journal_ino
+                if not rotated:
+                    self._journal_ino = ino
+                    f.seek(self._journal_offset)
+                    data = f.read()
+        except FileNotFoundError:
+            # Gone since we last read it: rotated by a compaction elsewhere
+            rotated = self._journal_ino is not None
+            if not rotated:
+                self._journal_offset = 0
+                return
+
+        if rotated:
+            # Its events are now in the rotated journal or the snapshot
+            if not self._compacting:
+                self.load()
+            return
+
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        self._apply_lines(data[:end])
+        self._journal_offset += end
+
+    def _record_hook(self, obj: dict):
+        # Nested objects (timings, ...) lack the record keys and stay dicts
+        if all(key in obj for key in self.record_type.REQUIRED):
+            return self.record_type.from_dict(obj)
+        return obj
+
+    def _apply_lines(self, data: bytes):
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                event = loads(line)
+            except ValueError:
+                print(f"Skipping corrupt metadata journal line: {line[:80]!r}")
+                continue
+            self._apply(event)
+
+    def _apply(self, event: dict):
+        self._version += 1
+        if event["op"] == "put":
+            record = event["record"]
+            self._records[record["id"]] = self.record_type.from_dict(record)
+        elif event["op"] == "delete":
+            self._records.pop(event["id"], None)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(self, record: dict):
+        """Insert (or replace) a record"""
+        self._append({"op": "put", "record": record})
+
+    def remove(self, image_id: str) -> bool:
+        """Delete a record. Returns False if it did not exist."""
+        with self._lock:
+            self.refresh()
+            if image_id not in self._records:
+                return False
+            self._append({"op": "delete", "id": image_id})
+            return True
+
+    def _append(self, event: dict):
+        line = dumps(event) + b"\n"
+
+        with self._lock:
+            with self._file_lock():
+                # Catch up with other writers so our offset stays contiguous
+                self.refresh()
+                with open(self.journal_path, "ab") as f:
+                    f.write(line)
+                    st = os.fstat(f.fileno())
+
+                self._apply(event)
+                self._journal_ino = st.st_ino
+                self._journal_offset = st.st_size
+                journal_size = st.st_size
+
+        if journal_size >= self.compact_threshold:
+            self.compact_async()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def all(self) -> List[dict]:
+        """All records, newest first"""
+        with self._lock:
+            self.refresh()
+            return [record.to_dict() for record in reversed(self._records.values())]
+
+    def get(self, image_id: str) -> Optional[dict]:
+        with self._lock:
+            self.refresh()
+            record = self._records.get(image_id)
+            return record.to_dict() if record is not None else None
+
+    def responses(self) -> List[dict]:
+        """All records projected to the API response fields, newest first"""
+        with self._lock:
+            self.refresh()
+            return [record.to_response() for record in reversed(self._records.values())]
+
+    def encoded_responses(
+        self,
+        resolve: Optional[Callable[[List[dict]], List[dict]]] = None,
+        max_age: Optional[float] = None
+    ) -> bytes:
+        """
+        responses() as a JSON array, encoded once per change.
+
+        Repeated list requests with no writes in between return the same
+        bytes without touching the records again.
+
+        Args:
+            resolve: Applied to the responses before encoding (e.g. to
+                presign URLs); runs outside the store lock
+            max_age: Seconds a resolved list may be reused, None if forever
+        """
+        if resolve is None:
+            with self._lock:
+                self.refresh()
+                if self._encoded_version != self._version:
+                    self._encoded = dumps([record.to_response() for record in reversed(self._records.values())])
+                    self._encoded_version = self._version
+                return self._encoded
+
+        # One thread resolves at a time; the others wait and reuse its result
+        with self._resolve_lock:
+            with self._lock:
+                self.refresh()
+                version = self._version
+                if self._resolved_version == version and time.monotonic() < self._resolved_until:
+                    return self._resolved
+                responses = [record.to_response() for record in reversed(self._records.values())]
+
+            started = time.monotonic()
+            encoded = dumps(resolve(responses))
+            self._resolved = encoded
+            self._resolved_version = version
+            self._resolved_until = started + max_age if max_age is not None else float("inf")
+            return encoded
+
+    def ids(self) -> Set[str]:
+        """Snapshot of all record ids"""
+        with self._lock:
+            self.refresh()
+            return set(self._records)
+
+    def __contains__(self, image_id: str) -> bool:
+        with self._lock:
+            self.refresh()
+            return image_id in self._records
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            return len(self._records)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact_async(self):
+        """Start a background compaction unless one is already running"""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        thread = threading.Thread(target=self._compact_guarded, daemon=True)
+        thread.start()
+
+    def compact(self):
+        """Fold the journal into a new snapshot (blocking)"""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        self._compact_guarded()
+
+    def _compact_guarded(self):
+        try:
+            self._compact()
+        except Exception as e:
+            print(f"Metadata compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _compact(self):
+        # Rotate the journal under the lock so appends can continue into a
+        # fresh file while the snapshot is written out.
+        with self._lock:
+            with self._file_lock():
+                self._tail_journal()
+                if not os.path.exists(self.journal_path):
+                    return
+                if os.path.exists(self.rotated_path):
+                    # Leftover from an interrupted compaction; already
+                    # replayed into memory by load()
+                    os.remove(self.rotated_path)
+                os.replace(self.journal_path, self.rotated_path)
+                self._journal_ino = None
+                self._journal_offset = 0
+                snapshot = [record.to_dict() for record in reversed(self._records.values())]
+
+        # Compact encoding: no indentation, orjson when available
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(dumps(snapshot))
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._file_lock():
+            os.replace(tmp_path, self.snapshot_path)
+            os.remove(self.rotated_path)
+            # Our records already match it; no reload needed
+            self._snapshot_id = self._stat_snapshot()
+
+        print(f"Compacted {os.path.basename(self.snapshot_path)}: {len(snapshot)} records")
+
+    def _file_lock(self, shared: bool = False):
+        return _FileLock(self.lock_path, self._file_lock_held, shared)
+
+
+class _FileLock:
+    """
+    flock on a lock file, shared between processes. Exclusive for writers,
+    shared for readers. Re-entering on a thread that already holds it (e.g.
+    load() from refresh() inside _append()) reuses the outer lock.
+    """
+
+    def __init__(self, path: str, held: threading.local, shared: bool = False):
+        self.path = path
+        self.held = held
+        self.shared = shared
+        self.fd = None
+
+    def __enter__(self):
+        depth = getattr(self.held, "depth", 0)
+        self.held.depth = depth + 1
+        if depth:
+            return self
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        except BaseException:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            self.held.depth = depth
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.held.depth -= 1
+        if self.fd is None:
+            return
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Generation stages range from milliseconds (metadata) to ~10 minutes (3D)
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200,
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are collected by a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        if self.collect is not None:
+            try:
+                values = self.collect()
+            except Exception as e:
+                print(f"Metric collection failed for {self.name}: {e}")
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> ([bucket counts], sum, count)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry (no client library needed)"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), collect=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, collect))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "island_stage_duration_seconds",
+    "Time spent in each generation pipeline stage",
+    ["pipeline", "stage"],
+)
+JOBS_TOTAL = REGISTRY.counter(
+    "island_jobs_total",
+    "Finished generation jobs by kind and outcome",
+    ["kind", "outcome"],
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "island_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"],
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "island_admission_rejections_total",
+    "Generation requests rejected with 429, by endpoint and reason",
+    ["endpoint", "reason"],
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "island_event_loop_lag_seconds",
+    "How late the event loop woke up for its heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_STALLS = REGISTRY.counter(
+    "island_event_loop_stalls_total",
+    "Heartbeats delayed by more than LOOP_LAG_THRESHOLD",
+)
+EVICTIONS_TOTAL = REGISTRY.counter(
+    "island_evictions_total",
+    "Local artifacts evicted by retention, by kind, reason and whether an S3 copy was kept",
+    ["kind", "reason", "backed"],
+)
+TIME_TO_IMAGE_SECONDS = REGISTRY.histogram(
+    "island_time_to_image_seconds",
+    "Time from job start until an image is viewable, by tier (preview/final)",
+    ["tier"],
+)
+QUALITY_CHECKS = REGISTRY.counter(
+    "island_quality_checks_total",
+    "Panorama quality checks by result (passed, or the failed check: seam/pole/variance)",
+    ["result"],
+)
+
+
+def gpu_memory_bytes() -> Dict[Tuple[str, ...], float]:
+    """Allocated/reserved CUDA memory per device, empty if torch/CUDA is unavailable"""
+    try:
+        import torch
+    except ImportError:
+        return {}
+
+    if not torch.cuda.is_available():
+        return {}
+
+    values = {}
+    for device in range(torch.cuda.device_count()):
+        values[(str(device), "allocated")] = torch.cuda.memory_allocated(device)
+        values[(str(device), "reserved")] = torch.cuda.memory_reserved(device)
+    return values
+
+
+REGISTRY.gauge(
+    "island_gpu_memory_bytes",
+    "CUDA memory in use by this process",
+    ["device", "kind"],
+    collect=gpu_memory_bytes,
+)
+
+
+class StageTimer:
+    """
+    Collects per-stage wall-clock timings for one job.
+
+    Each span is observed into the STAGE_SECONDS histogram and accumulated
+    in `timings` (seconds per stage) so it can be attached to the job record.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+            STAGE_SECONDS.observe(elapsed, pipeline=self.pipeline, stage=stage)
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+def write_metrics(path: str):
+    """Write metrics in Prometheus text format (node_exporter textfile collector)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Move flat /app/generated_images/<id>.png files into the sharded layout
+(<root>/ab/cd/<id>.png) and rewrite local image URLs in the metadata index.
+
+Safe to re-run: files already in place are skipped, and the API keeps
+serving un-migrated files from their old location meanwhile.
+"""
+
+import argparse
+import os
+
+from metadata_store import MetadataStore
+from storage_backends import ShardedLocalBackend, is_data_file
+
+
+def migrate(images_dir: str, base_url: str, dry_run: bool = False) -> dict:
+    """
+    Migrate flat files into the sharded layout.
+
+    Args:
+        images_dir: Local images root
+        base_url: Public base URL used in local image URLs
+        dry_run: Only report what would be moved
+
+    Returns:
+        Counts of moved files, updated records and skipped entries
+    """
+
+    backend = ShardedLocalBackend(images_dir, base_url, "/images")
+    metadata = MetadataStore(images_dir)
+    stats = {"moved": 0, "records_updated": 0, "skipped": 0}
+
+    with os.scandir(images_dir) as entries:
+        flat_files = [e.name for e in entries if e.is_file() and is_data_file(e.name)]
+
+    for name in flat_files:
+        source = backend.legacy_path(name)
+        target = backend.sharded_path(name)
+
+        if os.path.exists(target):
+            stats["skipped"] += 1
+            continue
+
+        old_url = f"{base_url}/images/{name}"
+        new_url = f"{base_url}/images/{backend.sharded_key(name)}"
+
+        if dry_run:
+            print(f"Would move {source} -> {target}")
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+        stats["moved"] += 1
+
+        # Local URLs embed the path; S3/CDN URLs are unaffected
+        image_id, _ = os.path.splitext(name)
+        record = metadata.get(image_id)
+        if record and record.get("image_url") == old_url:
+            if not dry_run:
+                metadata.add({**record, "image_url": new_url})
+            stats["records_updated"] += 1
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate flat image storage to the sharded layout")
+
+    parser.add_argument(
+        "--images-dir",
+        type=str,
+        default=os.getenv("IMAGES_DIR", "/app/generated_images"),
+        help="Images directory (default: $IMAGES_DIR or /app/generated_images)"
+    )
+
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=os.getenv("PUBLIC_URL", os.getenv("LOCAL_BASE_URL", "http://localhost:8000")),
+        help="Base URL used in local image URLs (default: $PUBLIC_URL)"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report what would be moved without changing anything"
+    )
+
+    args = parser.parse_args()
+
+    stats = migrate(args.images_dir, args.base_url, args.dry_run)
+    print(f"Moved {stats['moved']} files, updated {stats['records_updated']} records, "
+          f"skipped {stats['skipped']} already migrated")
+
+
+if __name__ == "__main__":
+    main()
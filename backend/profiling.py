@@ -0,0 +1,251 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+
+PROFILE_MODES = ("cprofile", "sampler")
+
+
+class StackSampler:
+    """
+    Wall-clock stack sampler for a single thread.
+
+    A daemon thread snapshots the target thread's stack every `interval`
+    seconds via sys._current_frames() and counts identical stacks, which
+    renders directly as collapsed-stack text for flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileRecord:
+    """One captured profile (request or job)"""
+
+    def __init__(self, kind: str, target: str, mode: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.target = target
+        self.mode = mode
+        self.created_at = datetime.utcnow().isoformat()
+        self.duration: float = 0.0
+        self.pstats_data: Optional[bytes] = None
+        self.collapsed: Optional[str] = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "mode": self.mode,
+            "created_at": self.created_at,
+            "duration": self.duration,
+            "formats": self.formats(),
+        }
+
+    def formats(self) -> List[str]:
+        if self.mode == "cprofile":
+            return ["pstats", "text"]
+        return ["collapsed"]
+
+    def text(self, limit: int = 60) -> str:
+        """Human-readable cumulative-time report from the pstats data"""
+        stats = pstats.Stats(_StatsSource(marshal.loads(self.pstats_data)), stream=io.StringIO())
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _StatsSource:
+    """Adapter so pstats.Stats can load from an in-memory stats dict"""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Profiler:
+    """
+    Opt-in request and job profiling.
+
+    Requests are sampled at `sample_rate`; individual jobs are profiled when
+    armed by id. Profiles are kept in a bounded in-memory store and served
+    through the admin endpoints.
+
+    Config (env):
+        PROFILING_ENABLED: enable profiling at all (default: off)
+        PROFILE_SAMPLE_RATE: fraction of requests to profile (default: 0)
+        PROFILE_MODE: cprofile or sampler (default: sampler)
+        PROFILE_SAMPLE_INTERVAL: sampler interval in seconds (default: 0.005)
+        PROFILE_MAX_STORED: profiles kept in memory (default: 50)
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.mode = os.getenv("PROFILE_MODE", "sampler")
+        if self.mode not in PROFILE_MODES:
+            raise ValueError(f"PROFILE_MODE must be one of {PROFILE_MODES}")
+        self.sample_interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+        self.max_stored = int(os.getenv("PROFILE_MAX_STORED", "50"))
+
+        self._profiles: "OrderedDict[str, ProfileRecord]" = OrderedDict()
+        self._armed: Dict[str, str] = {}  # job_id -> mode
+        self._lock = threading.Lock()
+        # cProfile hooks are process-global on newer Pythons: one at a time
+        self._cprofile_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------------
+
+    def should_sample_request(self, path: str) -> bool:
+        if not self.enabled or self.sample_rate <= 0:
+            return False
+        if path.startswith("/api/admin/"):
+            return False
+        return random.random() < self.sample_rate
+
+    def arm_job(self, job_id: str, mode: Optional[str] = None):
+        """Profile the next run of `job_id`"""
+        mode = mode or self.mode
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {PROFILE_MODES}")
+        with self._lock:
+            self._armed[job_id] = mode
+
+    def take_armed(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            return self._armed.pop(job_id, None)
+
+    # ------------------------------------------------------------------
+    # Capture
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def profile(self, kind: str, target: str, mode: Optional[str] = None) -> Iterator[Optional[ProfileRecord]]:
+        """
+        Profile the enclosed block on the current thread.
+
+        Yields the ProfileRecord (filled in on exit), or None if a cProfile
+        capture is already running and this one had to be skipped.
+        """
+        mode = mode or self.mode
+        record = ProfileRecord(kind, target, mode)
+
+        if mode == "cprofile":
+            if not self._cprofile_lock.acquire(blocking=False):
+                yield None
+                return
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                yield record
+            finally:
+                profiler.disable()
+                self._cprofile_lock.release()
+                record.duration = time.perf_counter() - start
+                profiler.create_stats()
+                record.pstats_data = marshal.dumps(profiler.stats)
+                self._store(record)
+        else:
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            start = time.perf_counter()
+            sampler.start()
+            try:
+                yield record
+            finally:
+                sampler.stop()
+                record.duration = time.perf_counter() - start
+                record.collapsed = sampler.collapsed()
+                self._store(record)
+
+    @contextmanager
+    def profile_job(self, job_id: str, job) -> Iterator[None]:
+        """Profile a background job if it was armed; no-op otherwise"""
+        mode = self.take_armed(job_id) if self.enabled else None
+        if mode is None:
+            yield
+            return
+
+        with self.profile("job", job_id, mode) as record:
+            if record is not None:
+                job.profile_id = record.id
+            yield
+
+    def _store(self, record: ProfileRecord):
+        with self._lock:
+            self._profiles[record.id] = record
+            while len(self._profiles) > self.max_stored:
+                self._profiles.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles.values())]
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles a sampled fraction of HTTP requests"""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.should_sample_request(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        # Note: on the event loop thread this also captures any other
+        # coroutines that interleave with the request.
+        with self.profiler.profile("request", f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
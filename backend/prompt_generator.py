@@ -1,88 +1,170 @@
 import random
-from typing import Dict, List
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scenario_catalog import CompiledCatalog, ScenarioCatalog, get_catalog
+
+
+class SeededPermutation:
+    """
+    Deterministic pseudo-random permutation of range(size).
+
+    Uses a small Feistel network with cycle-walking, so any index can be
+    mapped in O(1) time and memory - no shuffled list is ever materialized.
+    """
+
+    MASK64 = 0xFFFFFFFFFFFFFFFF
+
+    def __init__(self, size: int, seed: int, rounds: int = 4):
+        self.size = size
+        self.bits = max(2, (size - 1).bit_length())
+        if self.bits % 2:
+            self.bits += 1
+        self.half = self.bits // 2
+        self.half_mask = (1 << self.half) - 1
+
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(64) for _ in range(rounds)]
+
+    def _round(self, value: int, key: int) -> int:
+        x = ((value ^ key) * 0x9E3779B97F4A7C15) & self.MASK64
+        x ^= x >> 29
+        x = (x * 0xBF58476D1CE4E5B9) & self.MASK64
+        x ^= x >> 32
+        return x & self.half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half) | right
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = self._encrypt(index)
+        # Cycle-walk back into range; the domain is < 4x size so this is short
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __iter__(self) -> Iterator[int]:
+        for i in range(self.size):
+            yield self[i]
 
 
 class PromptGenerator:
     """
     Generates detailed prompts for island survival scenarios.
     Creates varied, high-quality prompts for panoramic generation.
+
+    Scenario descriptions, modifiers and compatibility rules come from the
+    shared ScenarioCatalog (scenarios.json), which can be hot-reloaded.
     """
 
-    def __init__(self):
-        # Base scenarios with detailed descriptions
-        self.scenarios: Dict[str, List[str]] = {
-            "beach": [
-                "pristine tropical beach with white sand, crystal clear turquoise water, palm trees swaying in the breeze, scattered driftwood, gentle waves lapping the shore",
-                "rugged coastline with rocky outcrops, crashing waves, sea foam, distant mountains, overcast sky with dramatic clouds",
-                "secluded cove with golden sand, shallow lagoon, coral visible underwater, tropical vegetation, bright sunny day",
-                "volcanic black sand beach, dramatic cliffs, powerful surf, scattered volcanic rocks, moody atmosphere",
-            ],
-            "jungle": [
-                "dense tropical rainforest, towering trees with thick canopy, hanging vines, lush undergrowth, filtered sunlight, exotic plants",
-                "jungle clearing with ancient trees, vibrant flowers, butterflies, shafts of light breaking through leaves, misty atmosphere",
-                "overgrown jungle path, massive tree roots, dense foliage, tropical birds, humid atmosphere, green everywhere",
-                "bamboo forest with tall stalks, dappled light, zen-like atmosphere, occasional clearing, peaceful ambiance",
-            ],
-            "mountain": [
-                "mountain peak vista, snow-capped summits in distance, rocky terrain, alpine meadow, clear blue sky, panoramic view",
-                "high altitude mountain ridge, steep cliffs, jagged rocks, thin clouds below, dramatic elevation, vast landscape",
-                "mountain valley overlook, forested slopes, winding river below, expansive view, golden hour lighting",
-                "rocky mountain outcrop, mossy stones, small alpine plants, distant peaks, crisp mountain air",
-            ],
-            "cave": [
-                "mysterious cave entrance, stalactites and stalagmites, pools of water reflecting light, bioluminescent fungi, ethereal glow",
-                "deep cave chamber, ancient rock formations, underground lake, shafts of light from above, mystical atmosphere",
-                "coastal cave with ocean visible through opening, tide pools, wet rocks, echoing sounds of waves",
-                "volcanic cave with rough lava rock walls, otherworldly formations, hidden chambers, dramatic shadows",
-            ],
-            "ruins": [
-                "ancient temple ruins overgrown with jungle, moss-covered stone blocks, carved pillars, tropical plants reclaiming the structure",
-                "weathered stone ruins on coastal cliff, partially collapsed walls, ocean view, dramatic sky, sense of mystery",
-                "abandoned civilization remnants, crumbling architecture, vine-covered statues, forgotten plaza, historical atmosphere",
-                "mysterious megalithic structures, standing stones arranged in circle, grassy terrain, ancient power in the air",
-            ],
-            "storm": [
-                "dramatic storm approaching over ocean, dark clouds, lightning in distance, choppy seas, wind-swept beach",
-                "stormy jungle scene, rain pouring through canopy, lightning illuminating trees, wet foliage, intense atmosphere",
-                "mountain storm, swirling clouds, limited visibility, powerful winds, dramatic weather patterns, nature's fury",
-                "coastal storm, massive waves crashing, spray in the air, grey sky, turbulent sea, raw power of nature",
-            ],
-            "sunset": [
-                "breathtaking sunset over ocean, vibrant orange and pink sky, sun touching horizon, silhouetted palm trees, calm water reflecting colors",
-                "mountain sunset, golden light on peaks, long shadows, warm glow, transitioning to evening, spectacular colors",
-                "jungle sunset, sun rays through trees, golden hour lighting, peaceful atmosphere, wildlife settling for night",
-                "island sunset panorama, 360 degree view of colorful sky, warm light on landscape, end of day serenity",
-            ],
-            "night": [
-                "starry night sky over island, Milky Way visible, bioluminescent waves on beach, moonlight, cosmic wonder",
-                "moonlit jungle, mysterious shadows, nocturnal atmosphere, silvery light filtering through trees, quiet night sounds",
-                "night mountain vista, stars above, city lights far in distance, cool night air, peaceful darkness",
-                "beach at night, full moon reflection on water, stars above, gentle waves, tranquil nighttime scene",
-            ],
-        }
-
-        # Additional elements to add variety
-        self.weather_elements = [
-            "clear sunny day",
-            "partly cloudy",
-            "dramatic clouds",
-            "misty morning",
-            "golden hour lighting",
-            "overcast sky",
-            "scattered clouds",
-            "brilliant sunshine",
-        ]
-
-        self.atmosphere_elements = [
-            "serene atmosphere",
-            "mysterious ambiance",
-            "dramatic mood",
-            "peaceful setting",
-            "untouched wilderness",
-            "pristine nature",
-            "wild and remote",
-            "breathtaking vista",
-        ]
+    def __init__(self, catalog: Optional[ScenarioCatalog] = None):
+        self.catalog = catalog or get_catalog()
+
+    # Views onto the current catalog tables
+    @property
+    def scenarios(self) -> Dict[str, Tuple[str, ...]]:
+        return self.catalog.current.scenarios
+
+    @property
+    def weather_elements(self) -> Tuple[str, ...]:
+        return self.catalog.current.weather
+
+    @property
+    def atmosphere_elements(self) -> Tuple[str, ...]:
+        return self.catalog.current.atmosphere
+
+    def is_compatible(
+        self,
+        scenario: str,
+        base_prompt: str,
+        weather: str,
+        atmosphere: str,
+        tables: Optional[CompiledCatalog] = None
+    ) -> bool:
+        """Check a combination against the compatibility rules"""
+        tables = tables or self.catalog.current
+
+        excluded = tables.scenario_exclusions.get(scenario, ())
+        if weather in excluded or atmosphere in excluded:
+            return False
+
+        base = base_prompt.lower()
+        for modifier in (weather, atmosphere):
+            for keyword in tables.keyword_conflicts.get(modifier, ()):
+                if keyword in base:
+                    return False
+
+        return True
+
+    def _resolve_scenarios(self, scenario: str, tables: CompiledCatalog) -> List[str]:
+        if scenario == "random":
+            return list(tables.scenarios.keys())
+        if scenario in tables.scenarios:
+            return [scenario]
+        # Fallback to the default scenario if unknown
+        return [tables.default_scenario]
+
+    def _combination_space(self, scenarios: List[str], tables: CompiledCatalog) -> Tuple[List[int], int]:
+        """Cumulative start offsets per scenario and total combination count"""
+        per_base = len(tables.weather) * len(tables.atmosphere)
+        offsets = []
+        total = 0
+        for name in scenarios:
+            offsets.append(total)
+            total += len(tables.scenarios[name]) * per_base
+        return offsets, total
+
+    def iter_prompts(self, scenario: str = "random", seed: Optional[int] = None) -> Iterator[str]:
+        """
+        Lazily stream unique prompts for a scenario in seeded random order.
+
+        Every compatible (base, weather, atmosphere) combination is yielded
+        exactly once before the iterator is exhausted. The same seed always
+        produces the same sequence for a given catalog.
+
+        Args:
+            scenario: Type of scene or 'random' to draw across all scenarios
+            seed: Seed for the ordering (random if None)
+
+        Yields:
+            Detailed prompt strings
+        """
+
+        if seed is None:
+            seed = random.getrandbits(64)
+
+        # Pin one catalog version for the lifetime of the iterator
+        tables = self.catalog.current
+
+        scenarios = self._resolve_scenarios(scenario, tables)
+        offsets, total = self._combination_space(scenarios, tables)
+        if total == 0:
+            return
+
+        n_weather = len(tables.weather)
+        n_atmosphere = len(tables.atmosphere)
+
+        for index in SeededPermutation(total, seed):
+            slot = bisect_right(offsets, index) - 1
+            name = scenarios[slot]
+
+            # Decode mixed-radix index -> (base, weather, atmosphere)
+            local = index - offsets[slot]
+            local, a = divmod(local, n_atmosphere)
+            b, w = divmod(local, n_weather)
+
+            base_prompt = tables.scenarios[name][b]
+            weather = tables.weather[w]
+            atmosphere = tables.atmosphere[a]
+
+            if self.is_compatible(name, base_prompt, weather, atmosphere, tables):
+                yield f"{base_prompt}, {weather}, {atmosphere}"
 
     def generate(self, scenario: str = "random") -> str:
         """
@@ -94,39 +176,28 @@ class PromptGenerator:
         Returns:
             Detailed prompt string
         """
+        return next(self.iter_prompts(scenario))
 
-        # Handle random scenario
-        if scenario == "random":
-            scenario = random.choice(list(self.scenarios.keys()))
-
-        # Get base prompt
-        if scenario in self.scenarios:
-            base_prompt = random.choice(self.scenarios[scenario])
-        else:
-            # Fallback to beach if unknown scenario
-            base_prompt = random.choice(self.scenarios["beach"])
-
-        # Add variety with additional elements
-        weather = random.choice(self.weather_elements)
-        atmosphere = random.choice(self.atmosphere_elements)
-
-        # Combine elements
-        full_prompt = f"{base_prompt}, {weather}, {atmosphere}"
-
-        return full_prompt
-
-    def generate_batch(self, scenario: str, count: int = 5) -> List[str]:
+    def generate_batch(self, scenario: str, count: int = 5, seed: Optional[int] = None) -> List[str]:
         """
-        Generate multiple prompts for batch processing.
+        Generate multiple unique prompts for batch processing.
 
         Args:
             scenario: Type of scene
             count: Number of prompts to generate
+            seed: Seed for reproducible batches
 
         Returns:
-            List of prompt strings
+            List of prompt strings, no two alike
         """
-        return [self.generate(scenario) for _ in range(count)]
+        prompts = list(islice(self.iter_prompts(scenario, seed), count))
+
+        if len(prompts) < count:
+            raise ValueError(
+                f"Only {len(prompts)} unique prompts available for '{scenario}', requested {count}"
+            )
+
+        return prompts
 
     def get_all_scenarios(self) -> List[str]:
         """Get list of all available scenarios"""
@@ -0,0 +1,154 @@
+import os
+import random
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from metrics import QUALITY_CHECKS, StageTimer
+
+# Scores are computed on a grayscale copy reduced to about this width
+ANALYSIS_WIDTH = 512
+
+
+def score_panorama(image: Image.Image) -> Dict[str, float]:
+    """
+    Cheap quality scores for an equirectangular panorama.
+
+    All scores are ratios against the image's own statistics, so they don't
+    depend on resolution or overall contrast:
+
+    - seam: difference across the left/right edge vs. the same distance
+      anywhere else, at 1 column and at 1/16 of the width (the wider span
+      catches content that doesn't line up even when the edge pixels were
+      blended to meet). ~1 is seamless.
+    - pole: horizontal detail in the top/bottom 5% of rows vs. the whole
+      image. Rows near the poles are stretched in equirectangular images,
+      so detail there is distortion that pinches into artifacts in 3D.
+    - std: luminance standard deviation (0-255); near-blank frames are low.
+
+    Args:
+        image: Panorama (any size)
+
+    Returns:
+        {"seam": float, "pole": float, "std": float}
+    """
+    # Integer box reduction is the cheapest downsample PIL has
+    factor = max(1, image.width // ANALYSIS_WIDTH)
+    gray = (image.reduce(factor) if factor > 1 else image).convert("L")
+    g = np.asarray(gray, dtype=np.float32)
+    height, width = g.shape
+
+    dx = np.abs(np.diff(g, axis=1))
+    detail = max(float(dx.mean()), 1e-3)
+
+    # Roll the seam to the middle, between columns mid-1 and mid, and compare
+    # column pairs that cross it with pairs next to it that don't
+    mid = width // 2
+    rolled = np.roll(g, mid, axis=1)
+
+    near = np.abs(np.diff(rolled, axis=1)).mean(axis=0)  # pairs (x, x+1)
+    local = np.concatenate([near[mid - 9:mid - 1], near[mid:mid + 8]])
+    seam_near = float(near[mid - 1]) / max(float(local.mean()), 1e-3)
+
+    distance = width // 16 + 1  # wider than blend_seam's band
+    far = np.abs(rolled[:, distance:] - rolled[:, :-distance]).mean(axis=0)
+    crossing = far[mid - distance:mid]
+    beside = np.concatenate([far[mid - 3 * distance:mid - distance], far[mid:mid + 2 * distance]])
+    seam_far = float(crossing.mean()) / max(float(beside.mean()), 1e-3)
+
+    band = max(1, height // 20)
+    pole = max(float(dx[:band].mean()), float(dx[-band:].mean())) / detail
+
+    return {
+        "seam": round(max(seam_near, seam_far), 3),
+        "pole": round(pole, 3),
+        "std": round(float(g.std()), 3),
+    }
+
+
+class QualityGate:
+    """
+    Rejects visibly broken panoramas before they are encoded, uploaded or
+    turned into 3D worlds, and re-rolls the seed instead.
+
+    Config (env):
+        QUALITY_CHECK: Set to 0 to disable (default: 1)
+        QUALITY_MAX_SEAM: Highest seam score accepted (default: 3.0)
+        QUALITY_MAX_POLE: Highest pole score accepted (default: 2.5)
+        QUALITY_MIN_STD: Lowest luminance std accepted (default: 8.0)
+        QUALITY_MAX_ATTEMPTS: Renders per image, including the first (default: 3)
+    """
+
+    def __init__(self, max_seam: Optional[float] = None, max_pole: Optional[float] = None,
+                 min_std: Optional[float] = None, max_attempts: Optional[int] = None):
+        self.enabled = os.getenv("QUALITY_CHECK", "1").lower() not in ("0", "false", "no")
+        self.max_seam = max_seam if max_seam is not None else float(os.getenv("QUALITY_MAX_SEAM", "3.0"))
+        self.max_pole = max_pole if max_pole is not None else float(os.getenv("QUALITY_MAX_POLE", "2.5"))
+        self.min_std = min_std if min_std is not None else float(os.getenv("QUALITY_MIN_STD", "8.0"))
+        self.max_attempts = max(1, max_attempts or int(os.getenv("QUALITY_MAX_ATTEMPTS", "3")))
+
+    def failures(self, scores: Dict[str, float]) -> List[str]:
+        """Names of the checks the scores fail (empty if acceptable)"""
+        failed = []
+        if scores["seam"] > self.max_seam:
+            failed.append("seam")
+        if scores["pole"] > self.max_pole:
+            failed.append("pole")
+        if scores["std"] < self.min_std:
+            failed.append("variance")
+        return failed
+
+    def _badness(self, scores: Dict[str, float]) -> float:
+        # Worst threshold ratio; > 1 means failing
+        return max(scores["seam"] / self.max_seam, scores["pole"] / self.max_pole,
+                   self.min_std / max(scores["std"], 1e-3))
+
+    def generate(self, render: Callable[[int], Image.Image], seed: Optional[int] = None,
+                 timer: Optional[StageTimer] = None, label: str = "") -> Tuple[Image.Image, Dict]:
+        """
+        Render, score and re-render with a new seed until the image passes
+        or the attempts run out; the best attempt is kept either way.
+
+        Args:
+            render: Callable(seed) -> panorama
+            seed: Seed for the first attempt (random if None)
+            timer: Optional StageTimer; renders go to the "diffusion" stage
+                and scoring to "quality"
+            label: Log prefix, e.g. "[Job <id>]"
+
+        Returns:
+            (image, quality) where quality holds the scores plus "attempts",
+            "passed" and the "seed" of the kept image, for the metadata record
+        """
+        span = timer.span if timer else (lambda stage: nullcontext())
+        seed = seed if seed is not None else random.getrandbits(32)
+        best = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            with span("diffusion"):
+                image = render(seed)
+            if not self.enabled:
+                return image, {"attempts": 1, "passed": True, "seed": seed}
+
+            with span("quality"):
+                scores = score_panorama(image)
+            failed = self.failures(scores)
+            for result in failed or ["passed"]:
+                QUALITY_CHECKS.inc(result=result)
+
+            quality = {**scores, "attempts": attempt, "passed": not failed, "seed": seed}
+            if not failed:
+                return image, quality
+
+            prefix = f"{label} " if label else ""
+            print(f"{prefix}Quality check failed ({', '.join(failed)}: {scores}), "
+                  f"attempt {attempt}/{self.max_attempts}")
+            if best is None or self._badness(scores) < self._badness(best[1]):
+                best = (image, quality)
+            seed = random.getrandbits(32)
+
+        image, quality = best
+        quality["attempts"] = self.max_attempts
+        return image, quality
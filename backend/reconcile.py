@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Storage reconciliation and garbage collection.
+
+Cross-checks the metadata index against everything that holds artifacts:
+local PNGs (sharded and legacy flat), the S3 bucket (panoramas and
+worlds/ prefixes) and world_* directories under WORLDS_DIR. Reports
+orphans (files with no metadata record) and missing files (records whose
+panorama is gone everywhere), and deletes orphans with --delete. Deleted
+worlds are also dropped from the worlds index.
+
+Listings are streamed, so memory is bounded by the size of the metadata
+index rather than by the number of stored objects. Work is rate-limited
+with a token bucket so the job can run next to the live API.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Set, Tuple
+
+from artifacts import WORLD_PREFIX, file_size, tree_size, world_owner
+from metadata_store import MetadataStore
+from storage import ImageStorage
+from storage_backends import StorageBackend
+from world_store import WorldStore
+
+
+REMOTE_WORLDS_PREFIX = "worlds/"
+
+# S3 DeleteObjects takes at most 1000 keys per call
+DELETE_BATCH_SIZE = 1000
+
+
+class TokenBucket:
+    """
+    Blocking token bucket.
+
+    Args:
+        rate: Tokens added per second (0 disables limiting)
+        burst: Bucket capacity (default: one second's worth)
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            time.sleep((tokens - self.tokens) / self.rate)
+
+
+class Reconciler:
+    """
+    One reconciliation pass over local, S3 and world storage.
+
+    Files modified within `grace_seconds` are never treated as orphans:
+    a job writes its PNG (and uploads it) before committing the metadata
+    record, so very recent files may simply belong to in-flight jobs.
+    """
+
+    def __init__(
+        self,
+        storage: ImageStorage,
+        metadata: MetadataStore,
+        grace_seconds: float = 3600,
+        rate: float = 1000,
+        delete: bool = False,
+        prune_missing: bool = False,
+        sample_limit: int = 100,
+        worlds: Optional[WorldStore] = None,
+    ):
+        self.storage = storage
+        self.metadata = metadata
+        self.worlds = worlds
+        self.grace_seconds = grace_seconds
+        self.bucket = TokenBucket(rate)
+        self.delete = delete
+        self.prune_missing = prune_missing
+        self.sample_limit = sample_limit
+
+        self._known: Set[str] = set()
+        self._present: Set[str] = set()
+        self._cutoff = 0.0
+
+    def run(self) -> dict:
+        """
+        Run a full pass.
+
+        Returns:
+            JSON-serializable report with per-store counts and samples
+        """
+
+        started = time.time()
+        self._cutoff = started - self.grace_seconds
+        self._known = self.metadata.ids()
+        self._present = set()
+
+        report = {
+            "started_at": datetime.utcnow().isoformat(),
+            "dry_run": not self.delete,
+            "grace_seconds": self.grace_seconds,
+            "metadata_records": len(self._known),
+            "local": self._scan_backend(self.storage.local, self._local_owner),
+        }
+
+        if self.storage.use_s3:
+            report["remote"] = self._scan_backend(self.storage.remote, self._remote_owner)
+
+        report["worlds"] = self._scan_worlds(self.storage.worlds_dir)
+        report["missing"] = self._check_missing()
+        report["duration"] = round(time.time() - started, 3)
+        return report
+
+    # ------------------------------------------------------------------
+    # Ownership
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _local_owner(key: str) -> Optional[str]:
+        image_id, ext = os.path.splitext(key)
+        return image_id if ext == ".png" else None
+
+    @staticmethod
+    def _remote_owner(key: str) -> Optional[str]:
+        if key.startswith(REMOTE_WORLDS_PREFIX):
+            world_id = key[len(REMOTE_WORLDS_PREFIX):].split("/", 1)[0]
+            return world_owner(world_id)
+        if "/" in key:
+            return None  # Not something this app writes
+        image_id, ext = os.path.splitext(key)
+        return image_id if ext == ".png" else None
+
+    def _is_orphan(self, image_id: str) -> bool:
+        if image_id in self._known:
+            return False
+        # Re-check against the live journal: the record may have just landed
+        if self.metadata.get(image_id) is not None:
+            self._known.add(image_id)
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Scans
+    # ------------------------------------------------------------------
+
+    def _scan_backend(self, backend: StorageBackend, owner) -> dict:
+        stats = _new_stats()
+        pending: List[str] = []
+        deleted_worlds: Set[str] = set()
+
+        for key, mtime in backend.list_entries():
+            self.bucket.acquire()
+            stats["scanned"] += 1
+
+            image_id = owner(key)
+            if image_id is None:
+                stats["ignored"] += 1
+                continue
+
+            if not key.startswith(REMOTE_WORLDS_PREFIX):
+                self._present.add(image_id)
+
+            if not self._is_orphan(image_id):
+                continue
+            if mtime is not None and mtime > self._cutoff:
+                stats["skipped_recent"] += 1
+                continue
+
+            stats["orphans"] += 1
+            if hasattr(backend, "path"):
+                stats["orphan_bytes"] += file_size(backend.path(key))
+            _sample(stats, key, self.sample_limit)
+
+            if self.delete:
+                if key.startswith(REMOTE_WORLDS_PREFIX):
+                    deleted_worlds.add(key[len(REMOTE_WORLDS_PREFIX):].split("/", 1)[0])
+                pending.append(key)
+                if len(pending) >= DELETE_BATCH_SIZE:
+                    stats["deleted"] += self._delete_keys(backend, pending)
+                    pending = []
+
+        if pending:
+            stats["deleted"] += self._delete_keys(backend, pending)
+        for world_id in deleted_worlds:
+            self._forget_world(world_id)
+        return stats
+
+    def _delete_keys(self, backend: StorageBackend, keys: List[str]) -> int:
+        self.bucket.acquire(min(len(keys), self.bucket.capacity))
+        return backend.delete_many(keys)
+
+    def _scan_worlds(self, worlds_dir: str) -> dict:
+        stats = _new_stats()
+
+        for entry, world_id in _world_dirs(worlds_dir):
+            self.bucket.acquire()
+            stats["scanned"] += 1
+
+            image_id = world_owner(world_id)
+            if not self._is_orphan(image_id):
+                continue
+            try:
+                if entry.stat().st_mtime > self._cutoff:
+                    stats["skipped_recent"] += 1
+                    continue
+            except FileNotFoundError:
+                continue
+
+            stats["orphans"] += 1
+            stats["orphan_bytes"] += tree_size(entry.path)
+            _sample(stats, world_id, self.sample_limit)
+
+            if self.delete:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                self._forget_world(world_id)
+                stats["deleted"] += 1
+
+        return stats
+
+    def _forget_world(self, world_id: str):
+        # Keep /api/worlds from listing a world whose files are gone
+        if self.worlds is not None:
+            self.worlds.remove(world_id)
+
+    def _check_missing(self) -> dict:
+        """Records whose panorama exists in no store"""
+        stats = {"count": 0, "skipped_recent": 0, "pruned": 0, "sample": []}
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+
+        for image_id in sorted(self._known - self._present):
+            record = self.metadata.get(image_id)
+            if record is None:
+                continue
+            if _created_after(record, cutoff):
+                stats["skipped_recent"] += 1
+                continue
+
+            stats["count"] += 1
+            _sample(stats, image_id, self.sample_limit)
+
+            if self.delete and self.prune_missing:
+                self.bucket.acquire()
+                if self.metadata.remove(image_id):
+                    stats["pruned"] += 1
+
+        return stats
+
+
+def _new_stats() -> dict:
+    return {
+        "scanned": 0,
+        "ignored": 0,
+        "skipped_recent": 0,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "deleted": 0,
+        "sample": [],
+    }
+
+
+def _sample(stats: dict, item: str, limit: int):
+    if len(stats["sample"]) < limit:
+        stats["sample"].append(item)
+
+
+def _world_dirs(worlds_dir: str) -> Iterator[Tuple[os.DirEntry, str]]:
+    try:
+        with os.scandir(worlds_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(WORLD_PREFIX) and entry.is_dir(follow_symlinks=False):
+                    yield entry, entry.name
+    except FileNotFoundError:
+        return
+
+
+def _created_after(record: dict, cutoff: datetime) -> bool:
+    try:
+        return datetime.fromisoformat(record.get("created_at", "")) > cutoff
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile metadata with stored files and collect orphans")
+
+    parser.add_argument(
+        "--images-dir",
+        type=str,
+        default=os.getenv("IMAGES_DIR", "/app/generated_images"),
+        help="Images directory (default: $IMAGES_DIR or /app/generated_images)"
+    )
+
+    parser.add_argument(
+        "--worlds-dir",
+        type=str,
+        default=os.getenv("WORLDS_DIR", "/app/generated_worlds"),
+        help="3D worlds directory (default: $WORLDS_DIR or /app/generated_worlds)"
+    )
+
+    parser.add_argument(
+        "--grace",
+        type=float,
+        default=float(os.getenv("RECONCILE_GRACE_SECONDS", "3600")),
+        help="Ignore files modified within this many seconds (default: 3600)"
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=float(os.getenv("RECONCILE_RATE", "1000")),
+        help="Max files scanned/deleted per second, 0 for unlimited (default: 1000)"
+    )
+
+    parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="Delete orphans (default: report only)"
+    )
+
+    parser.add_argument(
+        "--prune-missing",
+        action="store_true",
+        help="With --delete, also remove metadata records whose panorama is gone"
+    )
+
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="Write the JSON report to this file instead of stdout"
+    )
+
+    args = parser.parse_args()
+
+    storage = ImageStorage(images_dir=args.images_dir, worlds_dir=args.worlds_dir)
+    metadata = MetadataStore(args.images_dir)
+    worlds = WorldStore(args.worlds_dir)
+
+    reconciler = Reconciler(
+        storage,
+        metadata,
+        grace_seconds=args.grace,
+        rate=args.rate,
+        delete=args.delete,
+        prune_missing=args.prune_missing,
+        worlds=worlds,
+    )
+    report = reconciler.run()
+
+    summary = ", ".join(
+        f"{store}: {report[store]['orphans']} orphans"
+        for store in ("local", "remote", "worlds") if store in report
+    )
+    print(f"Reconciled in {report['duration']}s - {summary}, {report['missing']['count']} missing")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
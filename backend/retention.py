@@ -0,0 +1,404 @@
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from artifacts import WORLD_PREFIX, file_size, tree_size, world_owner
+from metadata_store import MetadataStore
+from metrics import EVICTIONS_TOTAL
+from storage import ImageStorage
+from world_store import WorldStore
+
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(value: str) -> int:
+    """Parse '500M', '20G', '1.5T' or plain bytes; empty/0 means unlimited"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)i?B?\s*", value or "0", re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+class Artifact:
+    """One locally stored panorama or 3D world directory"""
+
+    __slots__ = ("kind", "artifact_id", "image_id", "path", "size", "created", "last_access", "backed")
+
+    def __init__(self, kind: str, artifact_id: str, image_id: str, path: str,
+                 size: int, created: float, last_access: float):
+        self.kind = kind
+        self.artifact_id = artifact_id
+        self.image_id = image_id
+        self.path = path
+        self.size = size
+        self.created = created
+        self.last_access = last_access
+        self.backed: Optional[bool] = None  # has a copy in S3; checked lazily
+
+
+class RetentionManager:
+    """
+    Disk quota and retention for local artifacts.
+
+    Every local panorama and world_* directory is tracked in an LRU ordered
+    by last access, along with a running byte total. Writes and deletes
+    adjust the counter directly, so enforcing the quota never rescans the
+    tree; a full rescan only runs at startup and every RETENTION_RESCAN_INTERVAL
+    seconds to pick up files written by other processes (auto_generate.py).
+
+    Policies (all optional):
+    - max bytes: evict least recently used artifacts down to the low watermark
+    - max age: evict artifacts created longer ago than this
+    - max per scenario: keep only the most recently used N panoramas per scenario
+
+    Artifacts that already have a copy in S3 are evicted first and only lose
+    their local copy; URLs keep pointing at S3, and panoramas are fetched
+    back on demand for 3D generation. Artifacts that exist only locally are
+    kept; they are only deleted for good (including their metadata or worlds
+    index record, and a deleted panorama's world) when
+    RETENTION_DELETE_UNBACKED is on.
+
+    Config (env):
+        RETENTION_MAX_BYTES: local byte quota, e.g. 200G (default: unlimited)
+        RETENTION_LOW_WATERMARK: evict down to this fraction of the quota (default: 0.9)
+        RETENTION_MAX_AGE_DAYS: maximum artifact age (default: unlimited)
+        RETENTION_MAX_PER_SCENARIO: panoramas kept per scenario (default: unlimited)
+        RETENTION_MIN_IDLE: never evict artifacts used within this many seconds (default: 600)
+        RETENTION_DELETE_UNBACKED: allow deleting artifacts with no S3 copy (default: false)
+        RETENTION_INTERVAL: seconds between background enforcement runs (default: 60)
+        RETENTION_RESCAN_INTERVAL: seconds between full rescans (default: 3600)
+    """
+
+    def __init__(self, storage: ImageStorage, metadata: MetadataStore, worlds: Optional[WorldStore] = None):
+        self.storage = storage
+        self.metadata = metadata
+        self.worlds = worlds
+
+        self.max_bytes = parse_size(os.getenv("RETENTION_MAX_BYTES", "0"))
+        self.low_watermark = float(os.getenv("RETENTION_LOW_WATERMARK", "0.9"))
+        self.max_age = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0")) * 86400
+        self.max_per_scenario = int(os.getenv("RETENTION_MAX_PER_SCENARIO", "0"))
+        self.min_idle = float(os.getenv("RETENTION_MIN_IDLE", "600"))
+        self.delete_unbacked = os.getenv("RETENTION_DELETE_UNBACKED", "false").lower() in ("1", "true", "yes")
+        self.interval = float(os.getenv("RETENTION_INTERVAL", "60"))
+        self.rescan_interval = float(os.getenv("RETENTION_RESCAN_INTERVAL", "3600"))
+
+        # "image:<id>" / "world:<world_id>" -> Artifact, least recently used first
+        self._artifacts: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._scenarios: Dict[str, str] = {}  # image_id -> scenario
+        self._bytes = {"image": 0, "world": 0}
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_scan = 0.0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes["image"] + self._bytes["world"]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_bytes or self.max_age or self.max_per_scenario)
+
+    # ------------------------------------------------------------------
+    # Tracking
+    # ------------------------------------------------------------------
+
+    def track_image(self, image_id: str, scenario: Optional[str] = None):
+        """Account for a panorama just written to local storage"""
+        if not self.enabled:
+            return
+        path = self.storage.local_image_path(image_id)
+        size = file_size(path)
+        now = time.time()
+        with self._lock:
+            if scenario:
+                self._scenarios[image_id] = scenario
+            self._put(Artifact("image", image_id, image_id, path, size, now, now))
+        self._maybe_wake()
+
+    def track_world(self, world_id: str):
+        """Account for a world directory just written"""
+        if not self.enabled:
+            return
+        path = os.path.join(self.storage.worlds_dir, world_id)
+        now = time.time()
+        with self._lock:
+            self._put(Artifact("world", world_id, world_owner(world_id), path, tree_size(path), now, now))
+        self._maybe_wake()
+
+    def touch(self, kind: str, artifact_id: str):
+        """Mark an artifact as used (moves it to the MRU end)"""
+        key = f"{kind}:{artifact_id}"
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None:
+                artifact.last_access = time.time()
+                self._artifacts.move_to_end(key)
+
+    def touch_path(self, path: str):
+        """Mark the artifact behind a served /images or /worlds path as used"""
+        parts = path.strip("/").split("/")
+        if parts and parts[0].startswith(WORLD_PREFIX):
+            self.touch("world", parts[0])
+        elif parts and parts[-1].endswith(".png"):
+            self.touch("image", parts[-1][:-len(".png")])
+
+    def forget(self, kind: str, artifact_id: str):
+        """Stop tracking an artifact deleted by someone else"""
+        with self._lock:
+            artifact = self._artifacts.pop(f"{kind}:{artifact_id}", None)
+            if artifact is not None:
+                self._bytes[kind] -= artifact.size
+
+    def delete_image(self, image_id: str):
+        """
+        Permanently delete an image (S3, local copy, metadata record) and the
+        world generated from it (files and worlds index record).
+
+        Shared by DELETE /api/images and eviction of local-only panoramas,
+        so neither leaves an orphaned world behind.
+        """
+        self.storage.delete(image_id)
+        self.forget("image", image_id)
+
+        world = self.worlds.get_by_image(image_id) if self.worlds is not None else None
+        world_id = world["id"] if world is not None else f"{WORLD_PREFIX}{image_id}"
+        # Also covers a world on disk (or in S3) that was never indexed
+        self.storage.delete_world(world_id)
+        self.forget("world", world_id)
+        if world is not None:
+            self.worlds.remove(world_id)
+
+        self.metadata.remove(image_id)
+
+    def _put(self, artifact: Artifact):
+        key = f"{artifact.kind}:{artifact.artifact_id}"
+        previous = self._artifacts.pop(key, None)
+        if previous is not None:
+            # Re-tracked (e.g. restored from S3): age still counts from creation
+            self._bytes[previous.kind] -= previous.size
+            artifact.created = min(artifact.created, previous.created)
+        self._artifacts[key] = artifact
+        self._bytes[artifact.kind] += artifact.size
+
+    def _maybe_wake(self):
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Scanning
+    # ------------------------------------------------------------------
+
+    def scan(self):
+        """Rebuild the index and byte counter from disk"""
+        started = time.time()
+        found: List[Artifact] = []
+
+        for key, _ in self.storage.local.list_entries():
+            image_id, ext = os.path.splitext(key)
+            if ext != ".png":
+                continue
+            path = self.storage.local.path(key)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            found.append(Artifact("image", image_id, image_id, path, st.st_size,
+                                  st.st_mtime, max(st.st_atime, st.st_mtime)))
+
+        try:
+            with os.scandir(self.storage.worlds_dir) as entries:
+                world_dirs = [e for e in entries if e.name.startswith(WORLD_PREFIX) and e.is_dir()]
+        except FileNotFoundError:
+            world_dirs = []
+
+        for entry in world_dirs:
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append(Artifact("world", entry.name, world_owner(entry.name), entry.path,
+                                  tree_size(entry.path), st.st_mtime, max(st.st_atime, st.st_mtime)))
+
+        found.sort(key=lambda a: a.last_access)
+        scenarios = {
+            record["id"]: record.get("scenario", "")
+            for record in self.metadata.all()
+        }
+
+        with self._lock:
+            # Keep in-process access times, which are fresher than atime
+            for artifact in found:
+                current = self._artifacts.get(f"{artifact.kind}:{artifact.artifact_id}")
+                if current is not None:
+                    artifact.last_access = max(artifact.last_access, current.last_access)
+                    artifact.backed = current.backed
+            # Artifacts tracked while the scan was running may have been missed
+            seen = {f"{a.kind}:{a.artifact_id}" for a in found}
+            found.extend(a for key, a in self._artifacts.items() if key not in seen and a.created >= started)
+            found.sort(key=lambda a: a.last_access)
+
+            self._artifacts = OrderedDict((f"{a.kind}:{a.artifact_id}", a) for a in found)
+            self._scenarios = scenarios
+            self._bytes = {"image": 0, "world": 0}
+            for artifact in found:
+                self._bytes[artifact.kind] += artifact.size
+            self._last_scan = time.time()
+
+        print(f"Retention: tracking {len(found)} artifacts, {self.total_bytes / 1024 ** 3:.2f} GB")
+
+    # ------------------------------------------------------------------
+    # Enforcement
+    # ------------------------------------------------------------------
+
+    def ensure_space(self, nbytes: int) -> bool:
+        """
+        Evict synchronously so that nbytes more fit under the quota.
+
+        Returns:
+            True if there is room (or no quota)
+        """
+        if not self.max_bytes:
+            return True
+        if self.total_bytes + nbytes > self.max_bytes:
+            self._evict_to(self.max_bytes - nbytes, "quota")
+        return self.total_bytes + nbytes <= self.max_bytes
+
+    def enforce(self) -> Dict[str, int]:
+        """
+        Apply all policies once.
+
+        Returns:
+            Number of artifacts evicted per reason
+        """
+        evicted = {"age": 0, "scenario": 0, "quota": 0}
+
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            with self._lock:
+                expired = [a for a in self._artifacts.values() if a.created < cutoff]
+            for artifact in expired:
+                if self._evict(artifact, "age"):
+                    evicted["age"] += 1
+
+        if self.max_per_scenario:
+            evicted["scenario"] += self._enforce_scenarios()
+
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            evicted["quota"] += self._evict_to(int(self.max_bytes * self.low_watermark), "quota")
+
+        return evicted
+
+    def _enforce_scenarios(self) -> int:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for artifact in self._artifacts.values():
+                if artifact.kind == "image":
+                    scenario = self._scenarios.get(artifact.image_id, "")
+                    counts[scenario] = counts.get(scenario, 0) + 1
+            excess = {s: n - self.max_per_scenario for s, n in counts.items() if n > self.max_per_scenario}
+            # LRU order, so the least recently used panoramas go first
+            victims = []
+            for artifact in self._artifacts.values():
+                scenario = self._scenarios.get(artifact.image_id, "")
+                if artifact.kind == "image" and excess.get(scenario, 0) > 0:
+                    victims.append(artifact)
+                    excess[scenario] -= 1
+
+        return sum(1 for artifact in victims if self._evict(artifact, "scenario"))
+
+    def _evict_to(self, target_bytes: int, reason: str) -> int:
+        """Evict LRU artifacts until total_bytes <= target_bytes, S3-backed ones first"""
+        evicted = 0
+        for backed_only in (True, False):
+            if not backed_only and not self.delete_unbacked:
+                break
+            with self._lock:
+                candidates = list(self._artifacts.values())
+            for artifact in candidates:
+                if self.total_bytes <= target_bytes:
+                    return evicted
+                if backed_only and not self._is_backed(artifact):
+                    continue
+                if self._evict(artifact, reason):
+                    evicted += 1
+        return evicted
+
+    def _is_backed(self, artifact: Artifact) -> bool:
+        if not self.storage.use_s3:
+            return False
+        if artifact.backed is None:
+            try:
+                if artifact.kind == "image":
+                    artifact.backed = self.storage.remote.exists(f"{artifact.image_id}.png")
+                else:
+                    prefix = f"worlds/{artifact.artifact_id}/"
+                    artifact.backed = next(iter(self.storage.remote.list_keys(prefix)), None) is not None
+            except Exception as e:
+                print(f"Retention: could not check S3 copy of {artifact.artifact_id}: {e}")
+                return False
+        return artifact.backed
+
+    def _evict(self, artifact: Artifact, reason: str) -> bool:
+        if time.time() - artifact.last_access < self.min_idle:
+            return False
+
+        backed = self._is_backed(artifact)
+        if not backed and not self.delete_unbacked:
+            return False
+
+        # Claim it, so a concurrent ensure_space()/enforce() skips it
+        key = f"{artifact.kind}:{artifact.artifact_id}"
+        with self._lock:
+            if self._artifacts.get(key) is not artifact:
+                return False
+            del self._artifacts[key]
+            self._bytes[artifact.kind] -= artifact.size
+
+        if artifact.kind == "image":
+            if backed:
+                self.storage.local.delete(f"{artifact.artifact_id}.png")
+            else:
+                self.delete_image(artifact.image_id)
+        else:
+            shutil.rmtree(artifact.path, ignore_errors=True)
+            if not backed and self.worlds is not None:
+                self.worlds.remove(artifact.artifact_id)
+
+        EVICTIONS_TOTAL.inc(kind=artifact.kind, reason=reason, backed=str(backed).lower())
+        action = "Evicted local copy of" if backed else "Deleted"
+        print(f"Retention: {action} {artifact.kind} {artifact.artifact_id} ({reason}, {artifact.size} bytes)")
+        return True
+
+    # ------------------------------------------------------------------
+    # Background enforcer
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Scan once and enforce policies in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if time.time() - self._last_scan >= self.rescan_interval:
+                    self.scan()
+                self.enforce()
+            except Exception as e:
+                print(f"Retention enforcement failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stats(self) -> Dict[Tuple[str, ...], float]:
+        """Tracked bytes per artifact kind, for the metrics gauge"""
+        with self._lock:
+            return {(kind,): size for kind, size in self._bytes.items()}
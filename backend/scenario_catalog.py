@@ -0,0 +1,203 @@
+import os
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.json")
+
+
+class CatalogError(ValueError):
+    """Raised when a scenario catalog file is malformed"""
+
+
+@dataclass(frozen=True)
+class CompiledCatalog:
+    """Immutable lookup tables built from a validated catalog file"""
+
+    scenarios: Dict[str, Tuple[str, ...]]
+    weather: Tuple[str, ...]
+    atmosphere: Tuple[str, ...]
+    scenario_exclusions: Dict[str, FrozenSet[str]]
+    keyword_conflicts: Dict[str, Tuple[str, ...]]
+    scene_classes: Dict[str, str]
+    foreground_labels: Dict[str, Tuple[Optional[str], Optional[str]]]
+    default_scenario: str
+    default_scene_class: str
+    mtime: float
+
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise CatalogError(message)
+
+
+def _string_list(value, where: str) -> Tuple[str, ...]:
+    _require(isinstance(value, list), f"{where} must be a list")
+    for item in value:
+        _require(isinstance(item, str) and item.strip(), f"{where} must contain non-empty strings")
+    return tuple(value)
+
+
+def compile_catalog(data: dict, mtime: float = 0.0) -> CompiledCatalog:
+    """
+    Validate raw catalog data and precompile it into lookup tables.
+
+    Args:
+        data: Parsed catalog document
+        mtime: Modification time of the source file
+
+    Returns:
+        CompiledCatalog
+
+    Raises:
+        CatalogError: If the document is invalid
+    """
+
+    _require(isinstance(data, dict), "catalog must be an object")
+    _require(isinstance(data.get("scenarios"), dict) and data["scenarios"], "catalog needs at least one scenario")
+
+    weather = _string_list(data.get("weather", []), "weather")
+    atmosphere = _string_list(data.get("atmosphere", []), "atmosphere")
+    _require(weather and atmosphere, "weather and atmosphere must not be empty")
+    modifiers = set(weather) | set(atmosphere)
+
+    scenarios = {}
+    exclusions = {}
+    scene_classes = {}
+    foreground_labels = {}
+
+    for name, entry in data["scenarios"].items():
+        _require(name != "random", "'random' is reserved and cannot be a scenario name")
+        _require(isinstance(entry, dict), f"scenario '{name}' must be an object")
+
+        prompts = _string_list(entry.get("prompts", []), f"scenarios.{name}.prompts")
+        _require(prompts, f"scenario '{name}' has no prompts")
+        scenarios[name] = prompts
+
+        excluded = frozenset(_string_list(entry.get("exclude_modifiers", []), f"scenarios.{name}.exclude_modifiers"))
+        unknown = excluded - modifiers
+        _require(not unknown, f"scenario '{name}' excludes unknown modifiers: {sorted(unknown)}")
+        if excluded:
+            exclusions[name] = excluded
+
+        scene_class = entry.get("scene_class", data.get("default_scene_class", "outdoor"))
+        _require(isinstance(scene_class, str), f"scenarios.{name}.scene_class must be a string")
+        scene_classes[name] = scene_class
+
+        labels = entry.get("foreground_labels", [])
+        _require(isinstance(labels, list) and len(labels) <= 2, f"scenarios.{name}.foreground_labels takes up to 2 labels")
+        labels = list(labels) + [None] * (2 - len(labels))
+        foreground_labels[name] = (labels[0], labels[1])
+
+    keyword_conflicts = {}
+    for modifier, keywords in data.get("keyword_conflicts", {}).items():
+        _require(modifier in modifiers, f"keyword_conflicts references unknown modifier '{modifier}'")
+        # Stored lowercase so matching is a plain substring test
+        keyword_conflicts[modifier] = tuple(k.lower() for k in _string_list(keywords, f"keyword_conflicts.{modifier}"))
+
+    default_scenario = data.get("default_scenario", next(iter(scenarios)))
+    _require(default_scenario in scenarios, f"default_scenario '{default_scenario}' is not defined")
+
+    return CompiledCatalog(
+        scenarios=scenarios,
+        weather=weather,
+        atmosphere=atmosphere,
+        scenario_exclusions=exclusions,
+        keyword_conflicts=keyword_conflicts,
+        scene_classes=scene_classes,
+        foreground_labels=foreground_labels,
+        default_scenario=default_scenario,
+        default_scene_class=data.get("default_scene_class", "outdoor"),
+        mtime=mtime,
+    )
+
+
+class ScenarioCatalog:
+    """
+    Scenario catalog shared by PromptGenerator and HunyuanWorldGenerator.
+
+    Loads a JSON (or YAML, if PyYAML is installed) catalog file and keeps the
+    compiled tables in `current`. A background watcher can reload the file
+    when it changes; an invalid edit is reported and the previous tables are
+    kept, so a bad deploy never takes generation down.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SCENARIO_CATALOG", DEFAULT_CATALOG_PATH)
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.current = self._load()
+
+    def _read(self) -> dict:
+        with open(self.path, "r") as f:
+            if self.path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise CatalogError("PyYAML is required for YAML catalogs (pip install pyyaml)")
+                return yaml.safe_load(f)
+            return json.load(f)
+
+    def _load(self) -> CompiledCatalog:
+        mtime = os.path.getmtime(self.path)
+        try:
+            data = self._read()
+        except ValueError as e:
+            raise CatalogError(f"could not parse {self.path}: {e}")
+        return compile_catalog(data, mtime)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the catalog if the file changed on disk.
+
+        Returns:
+            True if new tables were swapped in
+        """
+        with self._lock:
+            try:
+                if os.path.getmtime(self.path) == self.current.mtime:
+                    return False
+                compiled = self._load()
+            except (OSError, CatalogError) as e:
+                print(f"Scenario catalog reload failed, keeping previous version: {e}")
+                return False
+
+            # Single attribute swap; readers grab `current` once per call
+            self.current = compiled
+            print(f"Scenario catalog reloaded: {len(compiled.scenarios)} scenarios")
+            return True
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll the catalog file for changes in a daemon thread"""
+        if self._watcher is not None:
+            return
+
+        if interval is None:
+            interval = float(os.getenv("SCENARIO_CATALOG_POLL_SECONDS", "5"))
+
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        self._watcher = None
+
+
+_shared_catalog: Optional[ScenarioCatalog] = None
+
+
+def get_catalog() -> ScenarioCatalog:
+    """Process-wide catalog instance"""
+    global _shared_catalog
+    if _shared_catalog is None:
+        _shared_catalog = ScenarioCatalog()
+    return _shared_catalog
@@ -0,0 +1,323 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import shutil
+import stat
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from artifacts import IMMUTABLE_CACHE_CONTROL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MUTABLE_CACHE_CONTROL = "no-cache"
+
+# Only these are worth precompressing; PNG is already compressed
+COMPRESSIBLE_EXTENSIONS = (".glb", ".gltf", ".json", ".obj", ".ply")
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CHUNK_SIZE = 64 * 1024
+
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("model/gltf+json", ".gltf")
+
+
+class ContentHashCache:
+    """
+    sha256 content hashes keyed by (path, size, mtime).
+
+    Each file is hashed once per process; a rewritten file (a regenerated
+    world) gets a new key automatically.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat_result: os.stat_result) -> str:
+        key = (path, stat_result.st_size, stat_result.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is not None:
+            return digest
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            if len(self._hashes) >= self.max_entries:
+                self._hashes.clear()
+            self._hashes[key] = digest
+        return digest
+
+
+def parse_accept_encoding(header: str) -> List[str]:
+    """Encodings the client accepts (q > 0), in header order"""
+    accepted = []
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.append(token)
+    return accepted
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `bytes=` header.
+
+    Returns:
+        (start, end) inclusive, or None to ignore the header (multi-range or
+        malformed - the full content is served instead)
+
+    Raises:
+        ValueError: If the range is syntactically valid but unsatisfiable
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_s, sep, end_s = spec.strip().partition("-")
+    start_s, end_s = start_s.strip(), end_s.strip()
+    if not sep:
+        return None
+
+    if start_s == "":
+        # Suffix range: last N bytes
+        if not end_s.isdigit():
+            return None
+        length = int(end_s)
+        if length == 0 or size == 0:
+            raise ValueError("unsatisfiable suffix range")
+        return max(0, size - length), size - 1
+
+    if not start_s.isdigit() or (end_s and not end_s.isdigit()):
+        return None
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+
+    if start >= size:
+        raise ValueError("range start beyond end of file")
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+async def _file_chunks(path: str, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class ArtifactFiles(StaticFiles):
+    """
+    StaticFiles for generated artifacts (panoramas and 3D worlds).
+
+    On top of plain StaticFiles this adds:
+    - immutable, year-long Cache-Control for artifacts, or `cache_control`
+      for mounts whose files are rewritten in place (metadata files stay
+      `no-cache`; dotfiles are not served at all)
+    - strong ETags from a sha256 of the content, with If-None-Match -> 304
+    - single-range `Range` requests (206/416) for resumable GLB downloads,
+      honouring If-Range
+    - precompressed `.br`/`.gz` siblings, served with Content-Encoding when
+      the client accepts them
+    - an optional `on_access(path)` hook, called for every served artifact
+      (used for LRU retention)
+    """
+
+    def __init__(self, *args, hash_cache: Optional[ContentHashCache] = None,
+                 on_access: Optional[Callable[[str], None]] = None,
+                 cache_control: str = IMMUTABLE_CACHE_CONTROL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hash_cache = hash_cache or ContentHashCache()
+        self.on_access = on_access
+        self.cache_control = cache_control
+
+    def is_mutable(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return name.startswith(".") or name.startswith("metadata")
+
+    def select_variant(self, full_path: str, headers: Headers) -> Tuple[str, Optional[str]]:
+        """Pick a precompressed sibling the client accepts, if one exists"""
+        if not full_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            return full_path, None
+
+        accepted = parse_accept_encoding(headers.get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted or "*" in accepted:
+                candidate = full_path + suffix
+                if os.path.isfile(candidate):
+                    return candidate, encoding
+        return full_path, None
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+
+        # Lock files and the job database live next to the images
+        if any(part.startswith(".") for part in path.split("/") if part):
+            raise HTTPException(status_code=404)
+
+        try:
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        except PermissionError:
+            raise HTTPException(status_code=401)
+
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+
+        if self.on_access is not None:
+            self.on_access(path)
+
+        request_headers = Headers(scope=scope)
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+        if self.is_mutable(full_path):
+            # Mutable files get plain StaticFiles behaviour plus revalidation
+            response = FileResponse(full_path, stat_result=stat_result, media_type=media_type)
+            response.headers["cache-control"] = MUTABLE_CACHE_CONTROL
+            if self.is_not_modified(response.headers, request_headers):
+                return Response(status_code=304, headers={
+                    k: v for k, v in response.headers.items() if k in ("etag", "cache-control")
+                })
+            return response
+
+        serve_path, encoding = await anyio.to_thread.run_sync(self.select_variant, full_path, request_headers)
+        if encoding:
+            stat_result = await anyio.to_thread.run_sync(os.stat, serve_path)
+
+        digest = await anyio.to_thread.run_sync(self.hash_cache.get, serve_path, stat_result)
+        etag = f'"{digest[:32]}"'
+        size = stat_result.st_size
+
+        headers = {
+            "cache-control": self.cache_control,
+            "etag": etag,
+            "accept-ranges": "bytes",
+        }
+        if full_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            headers["vary"] = "Accept-Encoding"
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in _split_etags(if_none_match)):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+                headers["content-length"] = str(length)
+                if scope["method"] == "HEAD":
+                    return Response(status_code=206, headers=headers, media_type=media_type)
+                return StreamingResponse(
+                    _file_chunks(serve_path, start, length),
+                    status_code=206,
+                    headers=headers,
+                    media_type=media_type,
+                )
+
+        return FileResponse(serve_path, stat_result=stat_result, headers=headers, media_type=media_type)
+
+
+def _split_etags(header: str) -> Iterable[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def precompress(path: str, min_size: int = 1024) -> List[str]:
+    """
+    Write .gz (and .br when brotli is installed) siblings for an artifact.
+
+    Args:
+        path: File to compress
+        min_size: Skip files smaller than this
+
+    Returns:
+        Paths of the compressed files written
+    """
+
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < min_size:
+        return []
+
+    written = []
+
+    tmp_path = f"{path}.gz.tmp"
+    with open(path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE * 16)
+    os.replace(tmp_path, f"{path}.gz")
+    written.append(f"{path}.gz")
+
+    if brotli is not None:
+        tmp_path = f"{path}.br.tmp"
+        compressor = brotli.Compressor(quality=9)
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE * 16), b""):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+        os.replace(tmp_path, f"{path}.br")
+        written.append(f"{path}.br")
+
+    return written
+
+
+def precompress_tree(root: str) -> int:
+    """Precompress every compressible artifact under root that lacks siblings"""
+    count = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and not os.path.exists(f"{path}.gz"):
+                if precompress(path):
+                    count += 1
+    return count
+
+
+# Backfill precompressed siblings for existing worlds
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else os.getenv("WORLDS_DIR", "/app/generated_worlds")
+    print(f"Precompressed {precompress_tree(root)} files under {root}")
@@ -1,26 +1,57 @@
 import os
+import shutil
+import mimetypes
 import boto3
 from botocore.exceptions import ClientError
-from typing import Optional
+from typing import List, Optional
+
+from storage_backends import StorageBackend, ShardedLocalBackend, S3Backend
 
 
 class ImageStorage:
     """
-    Handles image storage - either S3 or local filesystem.
+    Handles image and 3D world storage - either S3 or local filesystem.
     Automatically detects if AWS credentials are available.
+
+    Panoramas are always written to a hash-sharded local directory
+    (ShardedLocalBackend) and, when S3 is configured, uploaded to the bucket
+    (S3Backend). S3 objects are private by default and handed out as URLs in
+    one of three modes (S3_URL_MODE):
+    - cdn: CDN_BASE_URL + key (default when CDN_BASE_URL is set)
+    - presigned: cached presigned GET URLs, refreshed before they expire
+    - public: legacy public-read ACL and direct bucket URLs
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        images_dir: Optional[str] = None,
+        worlds_dir: Optional[str] = None,
+        local: Optional[StorageBackend] = None,
+        remote: Optional[StorageBackend] = None
+    ):
         self.use_s3 = False
         self.s3_client = None
         self.bucket_name = os.getenv("S3_BUCKET_NAME")
         self.region = os.getenv("S3_REGION", "us-east-1")
 
+        self.images_dir = images_dir or os.getenv("IMAGES_DIR", "/app/generated_images")
+        self.worlds_dir = worlds_dir or os.getenv("WORLDS_DIR", "/app/generated_worlds")
+
         # Use PUBLIC_URL if set (for RunPod), otherwise localhost
         self.local_base_url = os.getenv("PUBLIC_URL", os.getenv("LOCAL_BASE_URL", "http://localhost:8000"))
 
-        # Try to initialize S3
-        self._init_s3()
+        # How S3 objects are exposed to clients
+        self.cdn_base_url = os.getenv("CDN_BASE_URL", "").rstrip("/") or None
+        self.url_mode = os.getenv("S3_URL_MODE", "cdn" if self.cdn_base_url else "presigned")
+
+        self.local = local or ShardedLocalBackend(self.images_dir, self.local_base_url, "/images")
+        self.remote = remote
+
+        if self.remote is not None:
+            self.use_s3 = True
+        else:
+            # Try to initialize S3
+            self._init_s3()
 
     def _init_s3(self):
         """Initialize S3 client if credentials are available"""
@@ -38,6 +69,18 @@ class ImageStorage:
 
                 # Test connection
                 self.s3_client.head_bucket(Bucket=self.bucket_name)
+                self.remote = S3Backend(
+                    self.s3_client,
+                    self.bucket_name,
+                    self.region,
+                    url_mode=self.url_mode,
+                    cdn_base_url=self.cdn_base_url,
+                    presign_expiry=int(os.getenv("S3_PRESIGN_EXPIRY", "3600")),
+                    # Refresh cached presigned URLs once less than this much validity is left
+                    presign_refresh_margin=int(os.getenv("S3_PRESIGN_REFRESH_MARGIN", "300")),
+                    # Presigned URLs kept in memory (LRU)
+                    url_cache_size=int(os.getenv("S3_URL_CACHE_SIZE", "50000")),
+                )
                 self.use_s3 = True
                 print(f"S3 storage initialized: {self.bucket_name}")
 
@@ -49,6 +92,53 @@ class ImageStorage:
             print("Falling back to local storage")
             self.use_s3 = False
 
+        except ValueError as e:
+            # Bad S3_URL_MODE / CDN_BASE_URL / numeric setting; don't crash the app at import
+            print(f"Invalid S3 configuration: {e}")
+            print("Falling back to local storage")
+            self.use_s3 = False
+
+    @property
+    def urls_expire(self) -> bool:
+        """True if stored URLs go stale and must be resolved at read time"""
+        return self.use_s3 and self.url_mode == "presigned"
+
+    def local_image_path(self, image_id: str) -> str:
+        """Path of the local PNG for an image (sharded, or legacy flat)"""
+        return self.local.path(f"{image_id}.png")
+
+    def ensure_local_image(self, image_id: str) -> str:
+        """
+        Local path of an image, downloading it from S3 if the local copy
+        was evicted by retention.
+
+        Returns:
+            Local path (may not exist if the image is gone everywhere)
+        """
+        path = self.local_image_path(image_id)
+        if not os.path.exists(path) and self.use_s3:
+            try:
+                self.local.put(f"{image_id}.png", self.remote.get(f"{image_id}.png"), "image/png")
+                print(f"Restored local copy from S3: {image_id}.png")
+                path = self.local_image_path(image_id)
+            except (KeyError, ClientError) as e:
+                print(f"Could not restore {image_id}.png from S3: {e}")
+        return path
+
+    def save_image(self, image_id: str, data: bytes) -> str:
+        """
+        Write encoded PNG bytes to local storage.
+
+        Args:
+            image_id: Unique identifier for the image
+            data: Encoded PNG
+
+        Returns:
+            Local path of the written file
+        """
+        self.local.put(f"{image_id}.png", data, "image/png")
+        return self.local_image_path(image_id)
+
     def upload(self, local_path: str, image_id: str) -> str:
         """
         Upload image to S3 or return local URL.
@@ -58,41 +148,57 @@ class ImageStorage:
             image_id: Unique identifier for the image
 
         Returns:
-            Public URL to the image
+            URL to the image
         """
 
         filename = f"{image_id}.png"
 
         if self.use_s3:
             try:
-                # Upload to S3
-                self.s3_client.upload_file(
-                    local_path,
-                    self.bucket_name,
-                    filename,
-                    ExtraArgs={
-                        'ContentType': 'image/png',
-                        'ACL': 'public-read'
-                    }
-                )
-
-                # Generate S3 URL
-                url = f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{filename}"
-                print(f"Uploaded to S3: {url}")
-                return url
+                self.remote.put_file(filename, local_path, 'image/png')
+                print(f"Uploaded to S3: {filename}")
+                return self.remote.url(filename)
 
             except ClientError as e:
                 print(f"S3 upload failed: {e}")
                 print("Falling back to local URL")
 
         # Return local URL
-        url = f"{self.local_base_url}/images/{filename}"
+        url = self.local.url(filename)
         print(f"Using local URL: {url}")
         return url
 
+    def upload_world(self, glb_path: str, world_id: str) -> str:
+        """
+        Upload a generated 3D world (.glb) to S3 or return local URL.
+
+        Args:
+            glb_path: Path to the local .glb file
+            world_id: Unique identifier for the world
+
+        Returns:
+            URL to the .glb file
+        """
+
+        filename = os.path.basename(glb_path)
+        key = f"worlds/{world_id}/{filename}"
+
+        if self.use_s3:
+            try:
+                content_type = mimetypes.guess_type(glb_path)[0] or 'model/gltf-binary'
+                self.remote.put_file(key, glb_path, content_type)
+                print(f"Uploaded world to S3: {key}")
+                return self.remote.url(key)
+
+            except ClientError as e:
+                print(f"S3 upload failed: {e}")
+                print("Falling back to local URL")
+
+        return f"{self.local_base_url}/worlds/{world_id}/{filename}"
+
     def delete(self, image_id: str) -> bool:
         """
-        Delete image from storage.
+        Delete image from storage (S3 and the local copy).
 
         Args:
             image_id: Unique identifier for the image
@@ -102,34 +208,79 @@ class ImageStorage:
         """
 
         filename = f"{image_id}.png"
+        deleted = False
 
         if self.use_s3:
             try:
-                self.s3_client.delete_object(
-                    Bucket=self.bucket_name,
-                    Key=filename
-                )
+                deleted = self.remote.delete(filename)
                 print(f"Deleted from S3: {filename}")
-                return True
 
             except ClientError as e:
                 print(f"S3 delete failed: {e}")
 
         # Delete local file
-        local_path = f"/app/generated_images/{filename}"
-        if os.path.exists(local_path):
-            os.remove(local_path)
+        if self.local.delete(filename):
             print(f"Deleted local file: {filename}")
-            return True
+            deleted = True
+
+        return deleted
+
+    def save_preview(self, image_id: str, data: bytes) -> str:
+        """
+        Write a preview PNG next to where the final image will go.
+
+        Previews are served from local storage only (never uploaded) and
+        are removed with delete_preview() once the final image exists.
+        Leftovers from crashed jobs have no metadata record, so reconcile
+        collects them as orphans.
+
+        Returns:
+            URL of the preview
+        """
+        filename = f"{image_id}.preview.png"
+        self.local.put(filename, data, "image/png")
+        return self.local.url(filename)
+
+    def delete_preview(self, image_id: str) -> bool:
+        return self.local.delete(f"{image_id}.preview.png")
+
+    def delete_world(self, world_id: str) -> bool:
+        """
+        Delete a 3D world from storage (S3 and the local directory).
+
+        Args:
+            world_id: Unique identifier for the world
 
-        return False
+        Returns:
+            True if anything was deleted
+        """
+        deleted = False
+
+        if self.use_s3:
+            try:
+                deleted = self.remote.delete_many(list(self.remote.list_keys(f"worlds/{world_id}/"))) > 0
+                print(f"Deleted world from S3: {world_id}")
+            except ClientError as e:
+                print(f"S3 world delete failed: {e}")
+
+        path = os.path.join(self.worlds_dir, world_id)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            print(f"Deleted local world: {world_id}")
+            deleted = True
+
+        return deleted
 
-    def get_url(self, image_id: str) -> str:
+    def is_local_url(self, url: str) -> bool:
+        return url.startswith(f"{self.local_base_url}/")
+
+    def get_url(self, image_id: str, min_valid: float = 0) -> str:
         """
         Get URL for an image.
 
         Args:
             image_id: Unique identifier for the image
+            min_valid: Seconds the URL must stay valid (presigned mode)
 
         Returns:
             URL to the image
@@ -138,6 +289,46 @@ class ImageStorage:
         filename = f"{image_id}.png"
 
         if self.use_s3:
-            return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{filename}"
+            return self.remote.url(filename, min_valid)
         else:
-            return f"{self.local_base_url}/images/{filename}"
+            return self.local.url(filename)
+
+    def get_world_url(self, world_id: str, filename: str = "scene.glb") -> str:
+        """Get URL for a 3D world file"""
+        if self.use_s3:
+            return self.remote.url(f"worlds/{world_id}/{filename}")
+        return f"{self.local_base_url}/worlds/{world_id}/{filename}"
+
+    @property
+    def list_ttl(self) -> Optional[float]:
+        """Seconds a resolve_images() result stays valid, None if forever"""
+        return self.remote.url_ttl if self.urls_expire else None
+
+    def resolve_images(self, records: List[dict]) -> List[dict]:
+        """
+        resolve_image() over many records, with URLs valid for at least
+        list_ttl seconds so the result can be cached that long (signing is
+        CPU-bound; call off the event loop).
+        """
+        if not self.urls_expire:
+            return records
+        min_valid = self.list_ttl or 0
+        return [self.resolve_image(record, min_valid) for record in records]
+
+    def resolve_image(self, record: dict, min_valid: float = 0) -> dict:
+        """
+        Return the record with a fresh image_url.
+
+        Only does work in presigned mode, where the URL stored at upload time
+        expires; local and CDN URLs are returned unchanged.
+        """
+        if not self.urls_expire or self.is_local_url(record["image_url"]):
+            return record
+        return {**record, "image_url": self.get_url(record["id"], min_valid)}
+
+    def resolve_world(self, record: dict) -> dict:
+        """resolve_image() for a worlds index record (world_url)"""
+        if not self.urls_expire or self.is_local_url(record["world_url"]):
+            return record
+        filename = record["world_url"].split("?")[0].rsplit("/", 1)[-1]
+        return {**record, "world_url": self.get_world_url(record["id"], filename)}
@@ -0,0 +1,371 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from artifacts import IMMUTABLE_CACHE_CONTROL, WORLD_CACHE_CONTROL
+from metrics import CACHE_REQUESTS
+
+
+URL_MODES = ("presigned", "cdn", "public")
+
+
+class StorageBackend(ABC):
+    """
+    Minimal object store interface used by ImageStorage.
+
+    Keys are relative, '/'-separated names such as "1731000000_ab12cd34.png"
+    or "worlds/world_x/scene.glb".
+    """
+
+    # Seconds a url() result obtained with min_valid=url_ttl can be reused
+    # (e.g. in a cached list); None if URLs never expire
+    url_ttl: Optional[float] = None
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        """Store bytes under key (overwriting)"""
+
+    @abstractmethod
+    def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        """Store the contents of a local file under key"""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Return the object's bytes. Raises KeyError if missing."""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Delete key. Returns False if it did not exist."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check whether key exists"""
+
+    @abstractmethod
+    def url(self, key: str, min_valid: float = 0) -> str:
+        """Client-facing URL for key, valid for at least min_valid more seconds"""
+
+    @abstractmethod
+    def list_entries(self, prefix: str = "") -> Iterator[Tuple[str, Optional[float]]]:
+        """Stream (key, mtime) for all keys starting with prefix; mtime may be None"""
+
+    def list_keys(self, prefix: str = "") -> Iterator[str]:
+        """Stream all keys starting with prefix"""
+        for key, _ in self.list_entries(prefix):
+            yield key
+
+    # Batch operations; backends override these when they can do better
+    def put_many(self, items: Iterable[Tuple[str, bytes, Optional[str]]]):
+        for key, data, content_type in items:
+            self.put(key, data, content_type)
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        return sum(1 for key in keys if self.delete(key))
+
+    def exists_many(self, keys: Iterable[str]) -> Dict[str, bool]:
+        return {key: self.exists(key) for key in keys}
+
+
+class MemoryBackend(StorageBackend):
+    """In-memory backend for tests and benchmarks"""
+
+    def __init__(self, base_url: str = "memory://"):
+        self.base_url = base_url
+        self.objects: Dict[str, Tuple[bytes, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        with self._lock:
+            self.objects[key] = (bytes(data), content_type)
+
+    def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        with open(local_path, "rb") as f:
+            self.put(key, f.read(), content_type)
+
+    def get(self, key: str) -> bytes:
+        with self._lock:
+            return self.objects[key][0]
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self.objects.pop(key, None) is not None
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return key in self.objects
+
+    def url(self, key: str, min_valid: float = 0) -> str:
+        return f"{self.base_url}{key}"
+
+    def list_entries(self, prefix: str = "") -> Iterator[Tuple[str, Optional[float]]]:
+        with self._lock:
+            keys = [k for k in self.objects if k.startswith(prefix)]
+        return ((k, None) for k in keys)
+
+
+class ShardedLocalBackend(StorageBackend):
+    """
+    Local directory with a hash-sharded layout: <root>/ab/cd/<key>.
+
+    Two levels of 256 directories keep every directory small even with
+    millions of files, which keeps listings and StaticFiles lookups fast.
+    Files written before sharding (<root>/<key>) are still found by
+    `path()`; migrate_storage.py moves them into place.
+    """
+
+    def __init__(self, root: str, base_url: str, url_prefix: str = "/images"):
+        self.root = root
+        self.base_url = base_url
+        self.url_prefix = url_prefix
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def shard(key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{digest[:2]}/{digest[2:4]}"
+
+    def sharded_key(self, key: str) -> str:
+        return f"{self.shard(key)}/{key}"
+
+    def sharded_path(self, key: str) -> str:
+        return os.path.join(self.root, self.shard(key), key)
+
+    def legacy_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def path(self, key: str) -> str:
+        """Where key lives on disk (sharded, or legacy flat if not migrated)"""
+        sharded = self.sharded_path(key)
+        if not os.path.exists(sharded) and os.path.exists(self.legacy_path(key)):
+            return self.legacy_path(key)
+        return sharded
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        path = self.sharded_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        path = self.sharded_path(key)
+        if os.path.abspath(local_path) == os.path.abspath(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def delete(self, key: str) -> bool:
+        deleted = False
+        for path in (self.sharded_path(key), self.legacy_path(key)):
+            try:
+                os.remove(path)
+                deleted = True
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.sharded_path(key)) or os.path.exists(self.legacy_path(key))
+
+    def url(self, key: str, min_valid: float = 0) -> str:
+        if os.path.exists(self.legacy_path(key)) and not os.path.exists(self.sharded_path(key)):
+            return f"{self.base_url}{self.url_prefix}/{key}"
+        return f"{self.base_url}{self.url_prefix}/{self.sharded_key(key)}"
+
+    def list_entries(self, prefix: str = "") -> Iterator[Tuple[str, Optional[float]]]:
+        """Stream keys from both the sharded tree and the legacy flat files"""
+        for entry in _scandir(self.root):
+            if entry.is_file():
+                if is_data_file(entry.name) and entry.name.startswith(prefix):
+                    yield entry.name, _mtime(entry)
+            elif entry.is_dir() and len(entry.name) == 2:
+                for sub in _scandir(entry.path):
+                    if sub.is_dir() and len(sub.name) == 2:
+                        for leaf in _scandir(sub.path):
+                            if leaf.is_file() and is_data_file(leaf.name) and leaf.name.startswith(prefix):
+                                yield leaf.name, _mtime(leaf)
+
+
+def _scandir(path: str) -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            yield from it
+    except FileNotFoundError:
+        return
+
+
+def _mtime(entry: os.DirEntry) -> Optional[float]:
+    try:
+        return entry.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def is_data_file(name: str) -> bool:
+    # Skip dotfiles (locks), temp files and the metadata index itself
+    return not (name.startswith(".") or name.endswith(".tmp") or name.startswith("metadata"))
+
+
+class S3Backend(StorageBackend):
+    """
+    S3 bucket backend.
+
+    Objects are uploaded privately (unless url_mode is 'public') and exposed
+    via CDN URLs or cached presigned URLs that refresh before expiry. The
+    URL cache is an LRU of at most url_cache_size keys.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket_name: str,
+        region: str,
+        url_mode: str = "presigned",
+        cdn_base_url: Optional[str] = None,
+        presign_expiry: int = 3600,
+        presign_refresh_margin: int = 300,
+        url_cache_size: int = 50_000,
+    ):
+        if url_mode not in URL_MODES:
+            raise ValueError(f"S3_URL_MODE must be one of {URL_MODES}")
+        if url_mode == "cdn" and not cdn_base_url:
+            raise ValueError("S3_URL_MODE=cdn requires CDN_BASE_URL")
+
+        self.client = client
+        self.bucket_name = bucket_name
+        self.region = region
+        self.url_mode = url_mode
+        self.cdn_base_url = cdn_base_url
+        self.presign_expiry = presign_expiry
+        self.presign_refresh_margin = presign_refresh_margin
+        self.url_cache_size = url_cache_size
+        if url_mode == "presigned":
+            self.url_ttl = (presign_expiry - presign_refresh_margin) / 2
+        # key -> (url, expires_at), least recently used first
+        self._url_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._url_lock = threading.Lock()
+
+    def _extra_args(self, key: str, content_type: Optional[str]) -> dict:
+        # worlds/world_<image id>/ is re-uploaded under the same key when a
+        # world is regenerated, so only images can be cached as immutable
+        cache_control = WORLD_CACHE_CONTROL if key.startswith("worlds/") else IMMUTABLE_CACHE_CONTROL
+        extra_args = {'CacheControl': cache_control}
+        if content_type:
+            extra_args['ContentType'] = content_type
+        if self.url_mode == "public":
+            extra_args['ACL'] = 'public-read'
+        return extra_args
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        self.client.put_object(Bucket=self.bucket_name, Key=key, Body=data, **self._extra_args(key, content_type))
+
+    def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        # upload_file switches to multipart for large GLBs automatically
+        self.client.upload_file(local_path, self.bucket_name, key, ExtraArgs=self._extra_args(key, content_type))
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self.client.get_object(Bucket=self.bucket_name, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise KeyError(key)
+            raise
+
+    def delete(self, key: str) -> bool:
+        # S3 deletes are idempotent and don't report whether the key existed
+        self.client.delete_object(Bucket=self.bucket_name, Key=key)
+        self._forget_url(key)
+        return True
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        deleted = 0
+        batch: List[str] = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == 1000:
+                deleted += self._delete_batch(batch)
+                batch = []
+        if batch:
+            deleted += self._delete_batch(batch)
+        return deleted
+
+    def _delete_batch(self, keys: List[str]) -> int:
+        response = self.client.delete_objects(
+            Bucket=self.bucket_name,
+            Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+        )
+        for key in keys:
+            self._forget_url(key)
+        return len(keys) - len(response.get("Errors", []))
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def list_entries(self, prefix: str = "") -> Iterator[Tuple[str, Optional[float]]]:
+        # list_objects_v2 pages hold at most 1000 keys, so memory stays flat
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["LastModified"].timestamp()
+
+    def url(self, key: str, min_valid: float = 0) -> str:
+        """
+        Client-facing URL for an object.
+
+        Presigned URLs are cached and only regenerated when they are within
+        presign_refresh_margin (plus min_valid) seconds of expiring.
+        """
+
+        if self.url_mode == "cdn":
+            return f"{self.cdn_base_url}/{key}"
+        if self.url_mode == "public":
+            return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
+
+        now = time.time()
+        with self._url_lock:
+            cached = self._url_cache.get(key)
+            if cached:
+                self._url_cache.move_to_end(key)
+        if cached and cached[1] - now > self.presign_refresh_margin + min_valid:
+            CACHE_REQUESTS.inc(cache="presigned_url", result="hit")
+            return cached[0]
+
+        CACHE_REQUESTS.inc(cache="presigned_url", result="miss")
+        url = self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': key},
+            ExpiresIn=self.presign_expiry
+        )
+        with self._url_lock:
+            self._url_cache[key] = (url, now + self.presign_expiry)
+            self._url_cache.move_to_end(key)
+            while len(self._url_cache) > self.url_cache_size:
+                self._url_cache.popitem(last=False)
+        return url
+
+    def _forget_url(self, key: str):
+        with self._url_lock:
+            self._url_cache.pop(key, None)
@@ -0,0 +1,252 @@
+"""
+Tiled, memory-bounded refinement of equirectangular panoramas.
+
+A low-resolution base panorama is upscaled to the target size one tile at a
+time; each tile is passed through a `refine` callable (an img2img denoiser
+in production, anything Image -> Image in tests) and blended back with its
+neighbours.
+
+- Longitude wraps: the base's left/right edges are first made to meet
+  (blend_seam), then tile columns are laid out on a circle, so a tile that
+  crosses the right edge continues at column 0 and the seam is refined and
+  blended like any other overlap.
+- Latitude does not wrap (the poles are edges).
+- Overlaps are blended with a raised-cosine ramp and normalised by the
+  summed weights, so an identity `refine` reproduces the upscaled base.
+- Only one row of tiles is accumulated in float at a time; finished rows
+  are pasted straight into the 8-bit output image. Working memory is bounded by
+  the tile size and the output width, not the output height, and the model
+  only ever sees `tile_size` pixels.
+
+The module has no torch dependency so tiling and blending can be checked on
+CPU with a fake denoiser (see benchmarks/bench_tiled.py).
+"""
+
+import math
+import os
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Image -> Image of the same size
+RefineFn = Callable[[Image.Image], Image.Image]
+
+
+def tile_offsets(length: int, tile: int, overlap: int, circular: bool) -> List[int]:
+    """
+    Start offsets of tiles covering `length` pixels with at least `overlap`
+    pixels shared between neighbours.
+
+    Args:
+        length: Axis length in pixels
+        tile: Tile length (clamped to `length`)
+        overlap: Minimum overlap between neighbouring tiles
+        circular: Whether the axis wraps (longitude); the last tile then
+            overlaps the first across the seam
+
+    Returns:
+        Sorted offsets; with `circular`, tiles may extend past `length`
+    """
+    tile = min(tile, length)
+    if tile == length and not circular:
+        return [0]
+
+    stride = tile - overlap
+    if stride <= 0:
+        raise ValueError(f"Tile overlap ({overlap}) must be smaller than the tile ({tile})")
+
+    if circular:
+        # n tiles spaced evenly around the circle, each stride <= tile - overlap
+        count = max(2, math.ceil(length / stride))
+        return [round(i * length / count) for i in range(count)]
+
+    count = math.ceil((length - overlap) / stride)
+    if count <= 1:
+        return [0]
+    return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+
+def blend_ramp(length: int, overlap: int, start: bool = True, end: bool = True) -> np.ndarray:
+    """
+    1-D blend weights for one tile axis: a raised-cosine ramp over `overlap`
+    pixels at each blended edge, 1.0 elsewhere.
+
+    Weights never reach zero, so every covered pixel has a positive weight
+    sum even where only one tile contributes.
+    """
+    weights = np.ones(length, dtype=np.float32)
+    ramp_len = min(overlap, length // 2)
+    if ramp_len > 0:
+        k = np.arange(ramp_len, dtype=np.float32)
+        ramp = 0.5 - 0.5 * np.cos(np.pi * (k + 0.5) / ramp_len)
+        if start:
+            weights[:ramp_len] = ramp
+        if end:
+            weights[length - ramp_len:] = ramp[::-1]
+    return weights
+
+
+def blend_seam(image: Image.Image, band: int) -> Image.Image:
+    """
+    Make the left and right edges of an equirectangular image meet.
+
+    The per-row jump between the last and first column is spread as a
+    linear correction over `band` columns on each side of the seam, so the
+    texture is kept and only a low-frequency ramp is added.
+
+    Args:
+        image: Panorama to fix
+        band: Columns on each side of the seam to adjust (0 disables)
+
+    Returns:
+        New RGB image (or `image` unchanged when band is 0)
+    """
+    band = min(band, image.width // 2)
+    if band <= 0:
+        return image
+
+    pixels = np.asarray(image.convert("RGB"), dtype=np.float32).copy()
+    jump = pixels[:, 0] - pixels[:, -1]  # (H, 3)
+
+    k = np.arange(1, band + 1, dtype=np.float32) / band
+    # Right edge rises to +jump/2 at the last column, left edge falls to -jump/2
+    pixels[:, -band:] += jump[:, None, :] * (0.5 * k)[None, :, None]
+    pixels[:, :band] -= jump[:, None, :] * (0.5 * k[::-1])[None, :, None]
+    return Image.fromarray(np.clip(np.rint(pixels), 0, 255).astype(np.uint8))
+
+
+class TiledPanoramaRenderer:
+    """
+    Upscale + refine a panorama tile by tile.
+
+    Config (env):
+        PANORAMA_TILE_SIZE: Tile edge in output pixels (default: 1024)
+        PANORAMA_TILE_OVERLAP: Blend overlap in output pixels (default: 128)
+    """
+
+    def __init__(self, refine: RefineFn, tile_size: Optional[int] = None, overlap: Optional[int] = None):
+        self.refine = refine
+        self.tile_size = tile_size or int(os.getenv("PANORAMA_TILE_SIZE", "1024"))
+        self.overlap = overlap if overlap is not None else int(os.getenv("PANORAMA_TILE_OVERLAP", "128"))
+        if self.overlap * 2 >= self.tile_size:
+            raise ValueError("PANORAMA_TILE_OVERLAP must be less than half of PANORAMA_TILE_SIZE")
+
+    def plan(self, width: int, height: int) -> List[Tuple[int, int, int, int]]:
+        """Tiles as (x, y, w, h) in output pixels, row by row; x may wrap past width"""
+        tile_w = min(self.tile_size, width)
+        tile_h = min(self.tile_size, height)
+        xs = tile_offsets(width, tile_w, self.overlap, circular=True)
+        ys = tile_offsets(height, tile_h, self.overlap, circular=False)
+        return [(x, y, tile_w, tile_h) for y in ys for x in xs]
+
+    def render(self, base: Image.Image, width: int, height: int,
+               on_tile: Optional[Callable[[int, int], None]] = None) -> Image.Image:
+        """
+        Refine `base` into a width x height panorama.
+
+        Args:
+            base: Low-resolution panorama (any size, same aspect ratio)
+            width: Output width
+            height: Output height
+            on_tile: Optional callback(done, total) after each tile
+
+        Returns:
+            RGB PIL Image of size (width, height)
+        """
+        tiles = self.plan(width, height)
+        tile_w, tile_h = tiles[0][2], tiles[0][3]
+        rows = sorted({y for _, y, _, _ in tiles})
+        xs = sorted({x for x, _, _, _ in tiles})
+
+        scale_x = base.width / width
+        scale_y = base.height / height
+        base = blend_seam(base.convert("RGB"), math.ceil(self.overlap * scale_x))
+
+        # Base padded with wrapped columns on both sides, so crops can run
+        # past the seam and the resampling filter sees the other edge
+        margin = min(base.width, math.ceil(tile_w * scale_x) + 4)
+        padded = Image.new("RGB", (base.width + 2 * margin, base.height))
+        padded.paste(base.crop((base.width - margin, 0, base.width, base.height)), (0, 0))
+        padded.paste(base, (margin, 0))
+        padded.paste(base.crop((0, 0, margin, base.height)), (margin + base.width, 0))
+
+        wx = blend_ramp(tile_w, self.overlap)
+        output = Image.new("RGB", (width, height))
+
+        # Float accumulator for the current row of tiles only
+        band_top = 0
+        acc = np.zeros((tile_h, width, 3), dtype=np.float32)
+        wsum = np.zeros((tile_h, width), dtype=np.float32)
+
+        done = 0
+        for row_index, y in enumerate(rows):
+            if y != band_top:
+                self._shift_band(output, acc, wsum, band_top, y)
+                band_top = y
+
+            wy = blend_ramp(tile_h, self.overlap, start=row_index > 0, end=row_index < len(rows) - 1)
+            weights = wy[:, None] * wx[None, :]
+
+            for x in xs:
+                box = (margin + x * scale_x, y * scale_y, margin + (x + tile_w) * scale_x, (y + tile_h) * scale_y)
+                tile = padded.resize((tile_w, tile_h), Image.LANCZOS, box=box)
+
+                refined = self.refine(tile)
+                if refined.size != (tile_w, tile_h):
+                    refined = refined.resize((tile_w, tile_h), Image.LANCZOS)
+                pixels = np.asarray(refined.convert("RGB"), dtype=np.float32)
+
+                self._wrap_add(acc, pixels * weights[..., None], x)
+                self._wrap_add(wsum, weights, x)
+
+                done += 1
+                if on_tile:
+                    on_tile(done, len(tiles))
+
+        # Flush the last band
+        self._finalize(output, acc, wsum, band_top, height - band_top)
+        return output
+
+    @staticmethod
+    def _wrap_add(target: np.ndarray, values: np.ndarray, x: int):
+        """target[:, x:x+w] += values, wrapping columns past the right edge"""
+        width = target.shape[1]
+        w = values.shape[1]
+        first = min(w, width - x)
+        target[:, x:x + first] += values[:, :first]
+        if first < w:
+            target[:, :w - first] += values[:, first:]
+
+    @staticmethod
+    def _finalize(output: Image.Image, acc: np.ndarray, wsum: np.ndarray, top: int, rows: int):
+        # In place: these accumulator rows are discarded afterwards
+        blended = acc[:rows]
+        np.divide(blended, wsum[:rows, :, None], out=blended)
+        np.rint(blended, out=blended)
+        np.clip(blended, 0, 255, out=blended)
+        output.paste(Image.fromarray(blended.astype(np.uint8)), (0, top))
+
+    def _shift_band(self, output: Image.Image, acc: np.ndarray, wsum: np.ndarray, band_top: int, next_top: int):
+        """Write rows above the next tile row to output and carry the overlap (in place)"""
+        done_rows = next_top - band_top
+        self._finalize(output, acc, wsum, band_top, done_rows)
+
+        carry = acc.shape[0] - done_rows
+        acc[:carry] = acc[done_rows:]
+        wsum[:carry] = wsum[done_rows:]
+        acc[carry:] = 0
+        wsum[carry:] = 0
+
+
+def seam_error(image: Image.Image) -> float:
+    """
+    Mean absolute difference between the first and last pixel columns,
+    relative to the mean difference between neighbouring columns elsewhere.
+
+    ~1.0 means the longitude seam is as smooth as the rest of the image.
+    """
+    pixels = np.asarray(image.convert("RGB"), dtype=np.float32)
+    seam = np.abs(pixels[:, 0] - pixels[:, -1]).mean()
+    interior = np.abs(np.diff(pixels, axis=1)).mean()
+    return float(seam / max(interior, 1e-6))
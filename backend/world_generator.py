@@ -1,15 +1,20 @@
 import os
 import subprocess
+from contextlib import nullcontext
 from PIL import Image
 from typing import Optional
 
+from scenario_catalog import ScenarioCatalog, get_catalog
+from metrics import StageTimer
+
 
 class HunyuanWorldGenerator:
     """
     Wrapper for HunyuanWorld-1.0 to generate 3D worlds from panoramic images.
     """
 
-    def __init__(self):
+    def __init__(self, catalog: Optional[ScenarioCatalog] = None):
+        self.catalog = catalog or get_catalog()
         self.hunyuan_path = "/workspace/HunyuanWorld-1.0"
         self.available = os.path.exists(self.hunyuan_path)
 
@@ -27,7 +32,8 @@ class HunyuanWorldGenerator:
         output_path: str,
         classes: str = "outdoor",
         labels_fg1: Optional[str] = None,
-        labels_fg2: Optional[str] = None
+        labels_fg2: Optional[str] = None,
+        timer: Optional[StageTimer] = None
     ) -> str:
         """
         Generate 3D world mesh from panoramic image.
@@ -38,6 +44,7 @@ class HunyuanWorldGenerator:
             classes: Scene class (outdoor, indoor, etc.)
             labels_fg1: Foreground object labels (layer 1)
             labels_fg2: Foreground object labels (layer 2)
+            timer: Optional StageTimer for subprocess/GLB discovery spans
 
         Returns:
             Path to generated .glb file
@@ -66,15 +73,19 @@ class HunyuanWorldGenerator:
 
         print(f"Running HunyuanWorld: {' '.join(cmd)}")
 
+        def span(stage: str):
+            return timer.span(stage) if timer else nullcontext()
+
         # Run HunyuanWorld scene generation
         try:
-            result = subprocess.run(
-                cmd,
-                cwd=self.hunyuan_path,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minute timeout
-            )
+            with span("world_subprocess"):
+                result = subprocess.run(
+                    cmd,
+                    cwd=self.hunyuan_path,
+                    capture_output=True,
+                    text=True,
+                    timeout=600  # 10 minute timeout
+                )
 
             if result.returncode != 0:
                 print(f"Error output: {result.stderr}")
@@ -83,20 +94,11 @@ class HunyuanWorldGenerator:
             print(f"HunyuanWorld output: {result.stdout}")
 
             # Find generated .glb file
-            glb_file = os.path.join(output_path, "scene.glb")
-
-            if not os.path.exists(glb_file):
-                # Try alternative paths
-                possible_paths = [
-                    os.path.join(output_path, "mesh.glb"),
-                    os.path.join(output_path, "output.glb"),
-                ]
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        glb_file = path
-                        break
-                else:
-                    raise Exception(f"Generated .glb file not found in {output_path}")
+            with span("glb_discovery"):
+                glb_file = self.find_glb(output_path)
+
+            if glb_file is None:
+                raise Exception(f"Generated .glb file not found in {output_path}")
 
             return glb_file
 
@@ -105,32 +107,22 @@ class HunyuanWorldGenerator:
         except Exception as e:
             raise Exception(f"3D generation failed: {str(e)}")
 
+    def find_glb(self, output_path: str) -> Optional[str]:
+        """Locate the .glb file HunyuanWorld wrote into output_path"""
+        for name in ("scene.glb", "mesh.glb", "output.glb"):
+            path = os.path.join(output_path, name)
+            if os.path.exists(path):
+                return path
+        return None
+
     def get_scene_class(self, scenario: str) -> str:
         """Map scenario to scene class for HunyuanWorld"""
-        outdoor_scenarios = ["beach", "jungle", "mountain", "ruins", "storm", "sunset", "night", "random"]
-
-        if scenario in outdoor_scenarios:
-            return "outdoor"
-        elif scenario in ["cave"]:
-            return "indoor"
-        else:
-            return "outdoor"  # default
+        tables = self.catalog.current
+        return tables.scene_classes.get(scenario, tables.default_scene_class)
 
     def get_foreground_labels(self, scenario: str) -> tuple[Optional[str], Optional[str]]:
         """Get suggested foreground labels based on scenario"""
-
-        label_map = {
-            "beach": ("tree", "rock"),
-            "jungle": ("tree", "plant"),
-            "mountain": ("rock", "tree"),
-            "cave": ("rock", "stalactite"),
-            "ruins": ("column", "wall"),
-            "storm": ("tree", "cloud"),
-            "sunset": ("tree", "cloud"),
-            "night": ("tree", "star"),
-        }
-
-        return label_map.get(scenario, (None, None))
+        return self.catalog.current.foreground_labels.get(scenario, (None, None))
 
 
 # Example usage
@@ -0,0 +1,204 @@
+import os
+import sys
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from artifacts import WORLD_PREFIX, world_owner
+from fast_json import dumps
+from metadata_store import MetadataStore
+
+
+class WorldRecord:
+    """
+    Compact in-memory form of one generated 3D world.
+
+    Same layout as ImageRecord: the World3DResponse fields as slots, any
+    other keys in `extra`. size_bytes is the GLB size; generation_time is
+    the job's total seconds (None for worlds found on disk by rebuild()).
+    """
+
+    __slots__ = ("id", "image_id", "world_url", "created_at", "scenario",
+                 "size_bytes", "generation_time", "extra")
+
+    FIELDS = ("id", "image_id", "world_url", "created_at", "scenario", "size_bytes", "generation_time")
+    REQUIRED = ("id", "world_url")
+
+    def __init__(self, id: str, image_id: Optional[str], world_url: Optional[str],
+                 created_at: Optional[str], scenario: Optional[str], size_bytes: Optional[int] = None,
+                 generation_time: Optional[float] = None, extra: Optional[dict] = None):
+        self.id = id
+        self.image_id = image_id
+        self.world_url = world_url
+        self.created_at = created_at
+        self.scenario = sys.intern(scenario) if scenario else scenario
+        self.size_bytes = size_bytes
+        self.generation_time = generation_time
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "WorldRecord":
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS}
+        return cls(data["id"], data.get("image_id"), data.get("world_url"), data.get("created_at"),
+                   data.get("scenario"), data.get("size_bytes"), data.get("generation_time"), extra)
+
+    def to_dict(self) -> dict:
+        data = {name: getattr(self, name) for name in self.FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_response(self) -> dict:
+        """Only the World3DResponse fields (what the API returns)"""
+        return {
+            "id": self.id,
+            "image_id": self.image_id,
+            "world_url": self.world_url,
+            "created_at": self.created_at,
+            "scenario": self.scenario,
+            "size_bytes": self.size_bytes,
+            "generation_time": self.generation_time,
+        }
+
+
+class WorldStore(MetadataStore):
+    """
+    Persistent index of generated 3D worlds.
+
+    Uses the MetadataStore journal/snapshot format (.worlds.json next to the
+    world_* directories), so the API and auto_generate_3d.py can share it.
+    The files are dotfiles so the /worlds static mount never serves them.
+    Records are keyed by world id, with a second map from image id, so
+    both lookups are O(1).
+    """
+
+    record_type = WorldRecord
+
+    def __init__(self, directory: str, snapshot_name: str = ".worlds.json",
+                 compact_threshold: Optional[int] = None):
+        # image id -> world id; rebuilt on load, kept current by _apply
+        self._by_image: Dict[str, str] = {}
+        super().__init__(directory, snapshot_name, compact_threshold)
+
+    def load(self):
+        with self._lock:
+            super().load()
+            self._by_image = {
+                record.image_id: world_id
+                for world_id, record in self._records.items()
+                if record.image_id
+            }
+
+    def _apply(self, event: dict):
+        if event["op"] == "delete":
+            record = self._records.get(event["id"])
+            if record is not None and self._by_image.get(record.image_id) == record.id:
+                del self._by_image[record.image_id]
+        super()._apply(event)
+        if event["op"] == "put" and event["record"].get("image_id"):
+            self._by_image[event["record"]["image_id"]] = event["record"]["id"]
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_by_image(self, image_id: str) -> Optional[dict]:
+        """World of an image, or None"""
+        with self._lock:
+            self.refresh()
+            world_id = self._by_image.get(image_id)
+            return self._records[world_id].to_dict() if world_id is not None else None
+
+    def image_ids(self) -> Set[str]:
+        """Ids of the images that have a world"""
+        with self._lock:
+            self.refresh()
+            return set(self._by_image)
+
+    def page(self, offset: int = 0, limit: int = 50,
+             scenario: Optional[str] = None) -> Tuple[int, List[dict]]:
+        """
+        One page of worlds in API response form, newest first.
+
+        Args:
+            offset: Worlds to skip
+            limit: Page size
+            scenario: Only worlds of this scenario
+
+        Returns:
+            (total matching worlds, page)
+        """
+        with self._lock:
+            self.refresh()
+            records = reversed(self._records.values())
+            if scenario is None:
+                total = len(self._records)
+            else:
+                records = [record for record in records if record.scenario == scenario]
+                total = len(records)
+            return total, [record.to_response() for record in islice(records, offset, offset + limit)]
+
+    # ------------------------------------------------------------------
+    # Rebuild
+    # ------------------------------------------------------------------
+
+    def exists(self) -> bool:
+        """Whether an index was ever written to this directory"""
+        return any(os.path.exists(path) for path in (self.snapshot_path, self.journal_path, self.rotated_path))
+
+    def rebuild(
+        self,
+        find_glb: Callable[[str], Optional[str]],
+        world_url: Callable[[str, str], str],
+        scenario_of: Callable[[str], Optional[str]]
+    ) -> Optional[int]:
+        """
+        Build the index from world_* directories on disk, unless an index
+        already exists (first start after upgrading, or a lost index).
+
+        Args:
+            find_glb: Callable(world directory) -> GLB path or None
+            world_url: Callable(world id, GLB filename) -> URL
+            scenario_of: Callable(image id) -> scenario from the image metadata
+
+        Returns:
+            Number of worlds indexed, or None if an index already existed
+        """
+        with self._lock:
+            with self._file_lock():
+                # Another process may have built it while we waited
+                if self.exists():
+                    return None
+
+                snapshot = []
+                try:
+                    with os.scandir(self.directory) as entries:
+                        dirs = [e for e in entries if e.name.startswith(WORLD_PREFIX) and e.is_dir()]
+                except FileNotFoundError:
+                    dirs = []
+
+                for entry in dirs:
+                    glb_path = find_glb(entry.path)
+                    if not glb_path:
+                        continue  # HunyuanWorld never finished here
+                    st = os.stat(glb_path)
+                    image_id = world_owner(entry.name)
+                    snapshot.append(WorldRecord(
+                        entry.name, image_id, world_url(entry.name, os.path.basename(glb_path)),
+                        datetime.utcfromtimestamp(st.st_mtime).isoformat(), scenario_of(image_id),
+                        st.st_size,
+                    ))
+
+                # Stored newest first, like compaction writes it
+                snapshot.sort(key=lambda record: record.created_at, reverse=True)
+                tmp_path = f"{self.snapshot_path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(dumps([record.to_dict() for record in snapshot]))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+
+            self.load()
+
+        print(f"Rebuilt worlds index from {self.directory}: {len(snapshot)} worlds")
+        return len(snapshot)